@@ -1,20 +1,35 @@
+import atexit
+import gzip
+import importlib
 import io
 import json
 import os
+import queue
+import re
 import shlex
 import shutil
 import signal
 import subprocess
 import sys
+import tempfile
+import threading
 import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
 from datetime import datetime
+from functools import partial
 from distutils.spawn import find_executable
 from importlib.util import find_spec
+from itertools import count
 from pathlib import Path
-from typing import Callable, List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar, Union
+from urllib.parse import urlparse
 
 import requests
 
+T = TypeVar('T')
+
 OPTIONS = {}
 
 # fmt: off
@@ -37,6 +52,18 @@ OPTIONS['DISCONNECT_RUNTIME'] = DISCONNECT_RUNTIME
 USE_GOOGLE_DRIVE = True  #@param {type:"boolean"}
 OPTIONS['USE_GOOGLE_DRIVE'] = USE_GOOGLE_DRIVE
 
+#@markdown ##### <font color="orange">***WebUI 데이터를 로컬 디스크에서 사용할지?***</font>
+#@markdown 구글 드라이브와 동기화할 때 WebUI 가 로컬 디스크에 결과와 설정을 저장하고 백그라운드에서 드라이브에 반영함
+#@markdown <br>모델 디렉터리는 용량이 크므로 그대로 구글 드라이브를 사용함
+USE_LOCAL_DATA_DIR = False  #@param {type:"boolean"}
+OPTIONS['USE_LOCAL_DATA_DIR'] = USE_LOCAL_DATA_DIR
+
+#@markdown ##### <font color="orange">***로컬 디스크 모델 캐시 용량 (GB)***</font>
+#@markdown 구글 드라이브와 동기화할 때 자주 사용하는 체크포인트와 VAE 를 로컬 디스크에 복사해두고 빠르게 불러옴
+#@markdown <br>입력 란을 <font color="red">0</font> 으로 두면 캐시를 사용하지 않음
+MODEL_CACHE_SIZE = 0  #@param {type:"integer"}
+OPTIONS['MODEL_CACHE_SIZE'] = MODEL_CACHE_SIZE
+
 #@markdown ##### <font color="orange">***xformers 를 사용할지?***</font>
 #@markdown - <font color="green">장점</font>: 이미지 생성 속도 개선 가능성 있음
 #@markdown - <font color="red">단점</font>: 출력한 그림의 질이 조금 떨어질 수 있음
@@ -66,6 +93,12 @@ OPTIONS['TUNNEL'] = TUNNEL
 NGROK_API_TOKEN = '' #@param {type:"string"}
 OPTIONS['NGROK_API_TOKEN'] = NGROK_API_TOKEN
 
+#@markdown ##### <font color="orange">***중복된 모델 파일을 정리할지?***</font>
+#@markdown 내용이 같은 모델 파일을 하나만 남기고 나머지는 링크로 바꿔 구글 드라이브 용량을 아낌
+#@markdown <br><font color="red">**주의**</font>: 처음 실행할 땐 모든 모델 파일의 해시를 계산하므로 시간이 오래 걸림
+DEDUPE_MODELS = False  #@param {type:"boolean"}
+OPTIONS['DEDUPE_MODELS'] = DEDUPE_MODELS
+
 #@markdown ##### <font color="orange">***WebUI 레포지토리 주소***</font>
 REPO_URL = 'https://github.com/AUTOMATIC1111/stable-diffusion-webui.git' #@param {type:"string"}
 OPTIONS['REPO_URL'] = REPO_URL
@@ -82,6 +115,13 @@ OPTIONS['REPO_COMMIT'] = REPO_COMMIT
 PYTHON_EXECUTABLE = '' #@param {type:"string"}
 OPTIONS['PYTHON_EXECUTABLE'] = PYTHON_EXECUTABLE
 
+#@markdown ##### <font color="orange">***WebUI 스냅샷을 사용할지?***</font>
+#@markdown 처음 실행에 성공하면 레포지토리와 설치된 패키지를 작업 디렉터리의 `cache` 에 압축해두고
+#@markdown <br>다음 실행부터는 git 과 pip 작업 대신 압축 파일을 풀어 빠르게 시작함
+#@markdown <br><font color="red">**주의**</font>: 스냅샷 하나에 수 GB 의 용량이 필요함
+USE_SNAPSHOT = False  #@param {type:"boolean"}
+OPTIONS['USE_SNAPSHOT'] = USE_SNAPSHOT
+
 #@markdown ##### <font color="orange">***WebUI 인자***</font>
 #@markdown <font color="red">**주의**</font>: 비어있지 않으면 실행에 필요한 인자가 자동으로 생성되지 않음
 #@markdown <br>[사용할 수 있는 인자 목록](https://github.com/AUTOMATIC1111/stable-diffusion-webui/blob/master/modules/shared.py#L23)
@@ -97,10 +137,39 @@ OPTIONS['EXTRA_ARGS'] = shlex.split(EXTRA_ARGS)
 #####################################################
 # fmt: on
 
+# nvidia-smi 로 확인한 GPU 정보 (`probe_gpu()` 참고), GPU 가 없다면 None
+GPU_INFO: Optional[dict] = None
+
+# 기본 인자를 만들 때 VRAM(MB) 이 이 값보다 적으면 --lowvram, --medvram 인자 사용하기
+GPU_LOWVRAM_THRESHOLD = 4 * 1024
+GPU_MEDVRAM_THRESHOLD = 8 * 1024
+
 # 로그 변수
-LOG_FILE: Optional[io.TextIOWrapper] = None
+LOG_FILE: Optional['FileLogSink'] = None
+TRACE_FILE: Optional['FileLogSink'] = None
 LOG_WIDGET = None
-LOG_BLOCKS = []
+LOG_BLOCKS: Dict[int, dict] = {}
+LOG_BLOCK_IDS = count(1)
+LOG_LOCK = threading.RLock()
+
+# 로그 위젯 갱신 설정
+# 매 줄마다 위젯을 갱신하면 주피터 통신 채널이 포화되므로 변경 사항을 모아서 일정 주기로 렌더링함
+LOG_WIDGET_MAX_FPS = 4  # 초당 최대 렌더링 횟수
+LOG_WIDGET_MAX_BLOCKS = 300  # 위젯에 남겨둘 최대 블록 수, 넘어가면 오래된 블록부터 제거함
+LOG_WIDGET_MAX_CHILDS = 100  # 블록마다 보관할 최대 자식 로그 수
+LOG_WIDGET_STATS = {'renders': 0, 'bytes': 0}
+LOG_RENDER_TIMER: Optional[threading.Timer] = None
+LOG_RENDER_AT = 0.0
+LOG_LAYOUT_CHANGED = False
+LOG_REMOVED_WIDGETS: list = []  # 자식 목록에서 빠진 뒤에 닫을 위젯, 닫지 않으면 커널과 브라우저에 모델이 계속 남음
+
+# 로그 기록 파이프라인
+# 프로세스 출력을 읽는 스레드가 구글 드라이브 쓰기를 기다리지 않도록 기록을 큐에 넣고 별도의 스레드가 모아서 내보냄
+LOG_QUEUE: 'queue.SimpleQueue[Optional[Tuple[str, str]]]' = queue.SimpleQueue()
+LOG_SINKS: Dict[str, Union['StdoutLogSink', 'FileLogSink']] = {}
+LOG_WRITER: Optional[threading.Thread] = None
+LOG_FILE_MAX_BYTES = 16 * 1024 * 1024  # 로그 파일이 이 크기를 넘으면 압축하고 새 파일에 이어서 기록함
+LOG_KEEP_LAUNCHES = 30  # 남겨둘 실행 기록 수, 오래된 기록은 지움
 
 # 로그 HTML 위젯 스타일
 LOG_WIDGET_STYLES = {
@@ -160,7 +229,7 @@ def hook_runtime_disconnect():
     # 이는 nest-asyncio 패키지를 통해 어느정도 우회하여 사용할 수 있음
     # https://pypi.org/project/nest-asyncio/
     if not has_python_package('nest_asyncio'):
-        execute(['pip', 'install', 'nest-asyncio'])
+        pip_install('nest-asyncio')
 
     import nest_asyncio
     nest_asyncio.apply()
@@ -187,7 +256,7 @@ def setup_tunnels():
     elif tunnel == 'gradio':
         if not has_python_package('gradio'):
             # https://fastapi.tiangolo.com/release-notes/#0910
-            execute(['pip', 'install', 'gradio', 'fastapi==0.90.1'])
+            pip_install('gradio', 'fastapi==0.90.1')
 
         import secrets
 
@@ -196,14 +265,14 @@ def setup_tunnels():
 
     elif tunnel == 'cloudflared':
         if not has_python_package('pycloudflared'):
-            execute(['pip', 'install', 'pycloudflared'])
+            pip_install('pycloudflared')
 
         from pycloudflared import try_cloudflare
         TUNNEL_URL = try_cloudflare(port=7860).tunnel
 
     elif tunnel == 'ngrok':
         if not has_python_package('pyngrok'):
-            execute(['pip', 'install', 'pyngrok'])
+            pip_install('pyngrok')
 
         auth = None
         token = OPTIONS['NGROK_API_TOKEN']
@@ -245,9 +314,20 @@ def setup_environment():
             from IPython.display import display
             from ipywidgets import widgets
 
+            # 블록마다 HTML 위젯을 따로 두고 바뀐 블록만 갱신하므로 감싸는 요소의 스타일은 클래스로 지정함
             global LOG_WIDGET
-            LOG_WIDGET = widgets.HTML()
-            display(LOG_WIDGET)
+            LOG_WIDGET = widgets.VBox()
+            LOG_WIDGET.add_class('easy-sd-log')
+            display(
+                widgets.HTML(
+                    '<style>'
+                    f'''.easy-sd-log {{ {format_styles(LOG_WIDGET_STYLES['wrapper'])} }}'''
+                    '.easy-sd-log .widget-html { margin: 0; height: auto; }'
+                    '.easy-sd-log .widget-html-content { line-height: inherit; white-space: pre; }'
+                    '</style>'
+                ),
+                LOG_WIDGET
+            )
 
         except ImportError:
             pass
@@ -272,7 +352,21 @@ def setup_environment():
 
     log_path.parent.mkdir(0o777, True, True)
 
-    LOG_FILE = log_path.open('a')
+    LOG_FILE = FileLogSink(log_path, LOG_FILE_MAX_BYTES)
+    LOG_SINKS['file'] = LOG_FILE
+
+    # 실행 시간 분석을 위한 구조화된 기록 파일 만들기 (tools/trace_diff.py 로 비교할 수 있음)
+    global TRACE_FILE
+    TRACE_FILE = FileLogSink(log_path.with_suffix('.trace.jsonl'))
+    LOG_SINKS['trace'] = TRACE_FILE
+
+    # 이전 실행 기록 압축하고 정리하기
+    threading.Thread(
+        target=cleanup_logs,
+        args=(log_path.parent, log_path.stem),
+        name='log-cleanup',
+        daemon=True
+    ).start()
 
     # 현재 환경 출력
     import platform
@@ -299,64 +393,238 @@ def setup_environment():
 
                 log(f'override.json: {key} = {json.dumps(value)}')
 
-    if IN_COLAB:
-        # 다른 Python 버전 설치
-        if OPTIONS['PYTHON_EXECUTABLE'] and not find_executable(OPTIONS['PYTHON_EXECUTABLE']):
-            execute(['apt', 'install', OPTIONS['PYTHON_EXECUTABLE']])
-            execute(
-                f"curl -sS https://bootstrap.pypa.io/get-pip.py | {OPTIONS['PYTHON_EXECUTABLE']}"
-            )
 
-        # 런타임이 정상적으로 초기화 됐는지 확인하기
-        try:
-            import torch
-        except:
-            alert('torch 패키지가 잘못됐습니다, 런타임을 다시 실행해주세요!', True)
-        else:
-            if not torch.cuda.is_available():
-                alert('GPU 런타임이 아닙니다, 할당량이 초과 됐을 수도 있습니다!')
+def setup_python():
+    if not IN_COLAB:
+        return
 
-                OPTIONS['EXTRA_ARGS'] += [
-                    '--skip-torch-cuda-test',
-                    '--no-half',
-                    '--opt-sub-quad-attention'
-                ]
+    # 다른 Python 버전 설치
+    if OPTIONS['PYTHON_EXECUTABLE'] and not find_executable(OPTIONS['PYTHON_EXECUTABLE']):
+        execute(['apt', 'install', OPTIONS['PYTHON_EXECUTABLE']])
+        execute(
+            f"curl -sS https://bootstrap.pypa.io/get-pip.py | {OPTIONS['PYTHON_EXECUTABLE']}"
+        )
+
+
+def probe_gpu() -> Optional[dict]:
+    """
+    torch 를 불러오지 않고 nvidia-smi 로 첫 번째 GPU 의 이름, VRAM(MB), 연산 능력을 가져옵니다
 
-        # 코랩 tcmalloc 관련 이슈 우회
-        # https://github.com/googlecolab/colabtools/issues/3412
+    GPU 가 없거나 드라이버가 응답하지 않는다면 None 을 반환함
+    """
+    if not find_executable('nvidia-smi'):
+        return None
+
+    # 오래된 드라이버는 compute_cap 항목을 지원하지 않음
+    for fields in ('name,memory.total,compute_cap', 'name,memory.total'):
         try:
-            # 패키지가 이미 다운그레이드 됐는지 확인하기
-            execute('dpkg -l libunwind8-dev', hide_summary=True)
+            output = subprocess.check_output(
+                ['nvidia-smi', f'--query-gpu={fields}', '--format=csv,noheader,nounits'],
+                stderr=subprocess.DEVNULL,
+                text=True,
+                timeout=10)
         except subprocess.CalledProcessError:
-            for url in (
-                'http://launchpadlibrarian.net/367274644/libgoogle-perftools-dev_2.5-2.2ubuntu3_amd64.deb',
-                'https://launchpad.net/ubuntu/+source/google-perftools/2.5-2.2ubuntu3/+build/14795286/+files/google-perftools_2.5-2.2ubuntu3_all.deb',
-                'https://launchpad.net/ubuntu/+source/google-perftools/2.5-2.2ubuntu3/+build/14795286/+files/libtcmalloc-minimal4_2.5-2.2ubuntu3_amd64.deb',
-                'https://launchpad.net/ubuntu/+source/google-perftools/2.5-2.2ubuntu3/+build/14795286/+files/libgoogle-perftools4_2.5-2.2ubuntu3_amd64.deb'
-            ):
-                download(url, ignore_aria2=True)
-            execute('apt install -qq libunwind8-dev')
-            execute('dpkg -i *.deb')
-            execute('rm *.deb')
-
-    # 외부 터널링 초기화
-    setup_tunnels()
-
-    # 체크포인트 모델이 존재하지 않는다면 기본 모델 받아오기
-    if not has_checkpoint():
-        for file in [
-            {
-                'url': 'https://huggingface.co/gsdf/Counterfeit-V2.5/resolve/main/Counterfeit-V2.5_fp16.safetensors',
-                'target': str(workspace.joinpath('models/Stable-diffusion/Counterfeit-V2.5_fp16.safetensors')),
-                'summary': '기본 체크포인트 파일을 받아옵니다'
-            },
+            continue
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+
+        if not output.strip():
+            return None
+
+        values = [value.strip() for value in output.splitlines()[0].split(',')]
+
+        try:
+            compute_capability = float(values[2]) if len(values) > 2 else None
+        except ValueError:
+            compute_capability = None
+
+        return {
+            'name': values[0],
+            'vram': int(float(values[1])),
+            'compute_capability': compute_capability,
+        }
+
+    return None
+
+
+def check_gpu():
+    global GPU_INFO
+
+    GPU_INFO = probe_gpu()
+
+    if GPU_INFO:
+        log(f"GPU: {GPU_INFO['name']} ({GPU_INFO['vram']}MB, compute capability {GPU_INFO['compute_capability']})")
+
+    if not IN_COLAB:
+        return
+
+    # 런타임이 정상적으로 초기화 됐는지 확인하기
+    if not has_python_package('torch'):
+        alert('torch 패키지가 잘못됐습니다, 런타임을 다시 실행해주세요!', True)
+
+    if not GPU_INFO:
+        alert('GPU 런타임이 아닙니다, 할당량이 초과 됐을 수도 있습니다!')
+
+        OPTIONS['EXTRA_ARGS'] += [
+            '--skip-torch-cuda-test',
+            '--no-half',
+            '--opt-sub-quad-attention'
+        ]
+
+
+def setup_tcmalloc():
+    if not IN_COLAB:
+        return
+
+    # 코랩 tcmalloc 관련 이슈 우회
+    # https://github.com/googlecolab/colabtools/issues/3412
+    try:
+        # 패키지가 이미 다운그레이드 됐는지 확인하기
+        execute('dpkg -l libunwind8-dev', hide_summary=True)
+    except subprocess.CalledProcessError:
+        # 패키지 파일들과 apt 설치는 서로 의존하지 않으므로 동시에 진행하기
+        run_parallel([
+            *(
+                partial(download, url, ignore_aria2=True)
+                for url in (
+                    'http://launchpadlibrarian.net/367274644/libgoogle-perftools-dev_2.5-2.2ubuntu3_amd64.deb',
+                    'https://launchpad.net/ubuntu/+source/google-perftools/2.5-2.2ubuntu3/+build/14795286/+files/google-perftools_2.5-2.2ubuntu3_all.deb',
+                    'https://launchpad.net/ubuntu/+source/google-perftools/2.5-2.2ubuntu3/+build/14795286/+files/libtcmalloc-minimal4_2.5-2.2ubuntu3_amd64.deb',
+                    'https://launchpad.net/ubuntu/+source/google-perftools/2.5-2.2ubuntu3/+build/14795286/+files/libgoogle-perftools4_2.5-2.2ubuntu3_amd64.deb'
+                )
+            ),
+            partial(execute, 'apt install -qq libunwind8-dev')
+        ], max_workers=5)
+        execute('dpkg -i *.deb')
+        execute('rm *.deb')
+
+
+# models.json 의 `type` 값마다 파일을 저장할 작업 디렉터리 속 경로
+MODEL_TYPE_DIRS = {
+    'checkpoint': 'models/Stable-diffusion',
+    'vae': 'models/VAE',
+    'lora': 'models/Lora',
+    'hypernetwork': 'models/hypernetworks',
+    'embedding': 'embeddings',
+}
+
+# models.json 파일이 없을 때 받을 기본 모델들
+DEFAULT_MODELS = [
+    {
+        'type': 'checkpoint',
+        'url': 'https://huggingface.co/gsdf/Counterfeit-V2.5/resolve/main/Counterfeit-V2.5_fp16.safetensors',
+        'summary': '기본 체크포인트 파일을 받아옵니다'
+    },
+    {
+        'type': 'vae',
+        'url': 'https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/VAE/kl-f8-anime2.ckpt',
+        'summary': '기본 VAE 파일을 받아옵니다'
+    }
+]
+
+
+def load_model_manifest() -> Optional[List[dict]]:
+    """
+    작업 디렉터리의 `models.json` 에서 받아둘 모델 목록을 가져옵니다, 파일이 없다면 None 을 반환함
+
+        [
             {
-                'url': 'https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/VAE/kl-f8-anime2.ckpt',
-                'target': str(workspace.joinpath('models/VAE/kl-f8-anime2.ckpt')),
-                'summary': '기본 VAE 파일을 받아옵니다'
+                "type": "checkpoint",
+                "url": "https://huggingface.co/.../model.safetensors",
+                "name": "model.safetensors",
+                "size": 2132626066,
+                "sha256": "..."
             }
-        ]:
-            download(**file)
+        ]
+
+    `type` 대신 `path` 로 작업 디렉터리 기준 경로를 직접 적을 수 있고
+    `name` 을 비워두면 주소의 파일 이름을, `size` 와 `sha256` 은 적었을 때만 확인함
+    """
+    path = Path(WORKSPACE).joinpath('models.json')
+    if not path.exists():
+        return None
+
+    manifest = json.loads(path.read_text())
+    if not isinstance(manifest, list):
+        raise ValueError('models.json 파일은 모델 목록(배열)이여만 합니다')
+
+    return manifest
+
+
+def model_manifest_target(workspace: Path, entry: dict) -> Path:
+    if 'path' in entry:
+        return workspace.joinpath(entry['path'])
+
+    name = entry.get('name') or urlparse(entry['url']).path.split('/')[-1]
+    return workspace.joinpath(MODEL_TYPE_DIRS[entry['type']], name)
+
+
+def reconcile_models():
+    """
+    `models.json` 에 적힌 파일 중 디스크에 없거나 크기가 다른 파일만 동시에 받습니다
+
+    목록 파일이 없다면 체크포인트가 하나도 없을 때만 기본 모델들을 받음
+    """
+    workspace = Path(WORKSPACE).resolve()
+
+    manifest = load_model_manifest()
+    if manifest is None:
+        if has_checkpoint():
+            return
+
+        manifest = DEFAULT_MODELS
+
+    missing = []
+
+    for entry in manifest:
+        try:
+            target = model_manifest_target(workspace, entry)
+        except KeyError as e:
+            log(f'models.json: {json.dumps(entry)} 항목의 {e} 값이 없거나 잘못됐습니다', styles={'color': 'red'})
+            continue
+
+        # 받다 만 파일이라면 이어받기
+        incomplete = any(
+            target.with_name(target.name + suffix).exists()
+            for suffix in ('.aria2', '.parts')
+        )
+
+        if target.exists() and not incomplete:
+            if 'size' not in entry or target.stat().st_size == entry['size']:
+                continue
+
+            log(f'{target.name} 파일의 크기가 목록과 달라 다시 받습니다', styles={'color': 'orange'})
+            target.unlink()
+
+        missing.append((entry, target))
+
+    if not missing:
+        return
+
+    log(f'models.json: {len(manifest)}개 중 {len(missing)}개 파일을 받습니다')
+
+    def fetch_entry(entry: dict, target: Path) -> bool:
+        try:
+            download(
+                entry['url'],
+                str(target),
+                sha256=entry.get('sha256'),
+                size=entry.get('size'),
+                summary=entry.get('summary', f'{target.name} 파일을 받아옵니다'))
+            return True
+        except Exception as e:
+            log(f'{target.name} 파일을 받지 못했습니다: {e}', styles={'color': 'red'})
+            return False
+
+    # 일부 파일을 받지 못해도 웹UI 는 실행할 수 있으므로 오류를 던지지 않음
+    results = run_parallel([partial(fetch_entry, *item) for item in missing])
+    if not all(results):
+        log(f'{results.count(False)}개 파일을 받지 못했습니다', styles={'color': 'red'})
+
+
+def setup_model_store():
+    if OPTIONS['DEDUPE_MODELS']:
+        dedupe_models()
 
 
 # ==============================
@@ -368,37 +636,311 @@ def format_styles(styles: dict) -> str:
     return ';'.join(map(lambda kv: ':'.join(kv), styles.items()))
 
 
-def render_log() -> None:
+@contextmanager
+def trace(name: str, category: str, **attrs):
+    """
+    감싼 작업의 시작, 종료, 소요 시간을 `TRACE_FILE` 에 한 줄의 JSON 으로 기록합니다
+
+    반환된 딕셔너리에 종료 코드나 받은 바이트 수 등을 추가하면 함께 기록됨
+    """
+    span = {'name': name, 'cat': category, **attrs}
+    start = time.time()
+
+    try:
+        yield span
+    except BaseException as e:
+        span.setdefault('error', type(e).__name__)
+        raise
+    finally:
+        end = time.time()
+        span.update({
+            'start': round(start, 3),
+            'end': round(end, 3),
+            'duration': round(end - start, 3),
+            'thread': threading.current_thread().name
+        })
+
+        if TRACE_FILE:
+            emit_log('trace', json.dumps(span, ensure_ascii=False) + '\n')
+
+
+# 로그 출력 대상, 큐에서 꺼낸 기록을 모아서 `write()` 로 한 번에 내보냄
+class StdoutLogSink:
+    def write(self, text: str) -> None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+class FileLogSink:
+    """
+    파일에 기록합니다, `max_bytes` 를 넘으면 지금까지 기록한 내용을 `<파일>.<번호>.gz` 로 압축하고 새 파일에 이어서 기록함
+    """
+
+    def __init__(self, path: Path, max_bytes: Optional[int] = None) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.part = 0
+        self.file = path.open('a')
+        self.size = self.file.tell()
+
+    def write(self, text: str) -> None:
+        self.file.write(text)
+        self.file.flush()
+        self.size += len(text.encode())
+
+        if self.max_bytes and self.size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self) -> None:
+        self.file.close()
+        self.part += 1
+
+        rotated = self.path.with_name(f'{self.path.name}.{self.part}')
+        os.replace(self.path, rotated)
+        compress_log(rotated)
+
+        self.file = self.path.open('a')
+        self.size = 0
+
+
+# 표준 출력은 로그 파일이 만들어지기 전에도 사용함
+LOG_SINKS['stdout'] = StdoutLogSink()
+
+
+def compress_log(path: Path) -> None:
+    temp_path = path.with_name(path.name + '.gz.tmp')
+
+    with path.open('rb') as source, gzip.open(temp_path, 'wb') as target:
+        shutil.copyfileobj(source, target)
+
+    os.replace(temp_path, path.with_name(path.name + '.gz'))
+    path.unlink()
+
+
+def cleanup_logs(log_dir: Path, current: str) -> None:
+    """
+    `LOG_KEEP_LAUNCHES` 보다 오래된 실행 기록은 지우고 남은 이전 실행 기록은 gzip 으로 압축합니다
+    """
+    # 실행마다 `<시간>.log`, `<시간>.trace.jsonl` 등의 파일이 만들어짐
+    launches: Dict[str, List[Path]] = {}
+    for path in log_dir.iterdir():
+        if path.is_file():
+            launches.setdefault(path.name.split('.')[0], []).append(path)
+
+    for index, launch in enumerate(sorted(launches, reverse=True)):
+        if launch == current:
+            continue
+
+        for path in launches[launch]:
+            try:
+                if index >= LOG_KEEP_LAUNCHES or path.name.endswith('.tmp'):
+                    path.unlink()
+                elif not path.name.endswith('.gz'):
+                    compress_log(path)
+            except OSError as e:
+                log(f'{path.name} 로그 파일을 정리하지 못했습니다: {e}', print_to_widget=False)
+
+
+def log_writer() -> None:
+    """
+    큐에 쌓인 기록을 한 번에 꺼내 출력 대상마다 한 번씩만 내보냅니다
+
+    출력 대상이 느리면 그동안 쌓인 기록이 다음 묶음에 모이므로 기록하는 쪽은 기다리지 않음
+    """
+    while True:
+        records = [LOG_QUEUE.get()]
+
+        while True:
+            try:
+                records.append(LOG_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+
+        batches: Dict[str, List[str]] = {}
+        for record in records:
+            if record is not None:
+                batches.setdefault(record[0], []).append(record[1])
+
+        for name, texts in batches.items():
+            sink = LOG_SINKS.get(name)
+            if not sink:
+                continue
+
+            # 기록에 실패해도 다른 출력 대상과 다음 기록은 계속 내보내기
+            try:
+                sink.write(''.join(texts))
+            except Exception:
+                pass
+
+        # 종료 요청
+        if None in records:
+            return
+
+
+def emit_log(sink: str, text: str) -> None:
+    global LOG_WRITER
+
+    if LOG_WRITER is None:
+        with LOG_LOCK:
+            if LOG_WRITER is None:
+                LOG_WRITER = threading.Thread(target=log_writer, name='log-writer', daemon=True)
+                LOG_WRITER.start()
+
+                # 인터프리터가 종료될 때 남은 기록 마저 내보내기
+                atexit.register(drain_log)
+
+    LOG_QUEUE.put((sink, text))
+
+
+def drain_log() -> None:
+    """
+    큐에 남은 기록을 모두 내보낼 때까지 기다립니다
+    """
+    global LOG_WRITER
+
+    with LOG_LOCK:
+        writer = LOG_WRITER
+        LOG_WRITER = None
+
+    if writer:
+        LOG_QUEUE.put(None)
+        writer.join(timeout=30)
+
+
+def render_log_block(block: dict) -> str:
+    styles = {
+        'display': 'inline-block',
+        **block['styles']
+    }
+    child_styles = {
+        'display': 'inline-block',
+        **block['child_styles']
+    }
+
+    html = f'<span style="{format_styles(styles)}">{block["msg"]}</span>\n'
+
+    if block['max_childs'] is not None and len(block['childs']) > 0:
+        childs = list(block['childs'])
+        html += f'<div style="{format_styles(child_styles)}">'
+        html += ''.join(childs[-block['max_childs']:])
+        html += '</div>'
+
+    return html
+
+
+def flush_log() -> None:
+    """
+    변경된 로그 블록만 위젯에 반영합니다
+    """
+    global LOG_RENDER_TIMER, LOG_RENDER_AT, LOG_LAYOUT_CHANGED
+
     try:
         from ipywidgets import widgets
     except ImportError:
         return
 
-    if not isinstance(LOG_WIDGET, widgets.HTML):
+    if not isinstance(LOG_WIDGET, widgets.Box):
         return
 
-    html = f'''<div style="{format_styles(LOG_WIDGET_STYLES['wrapper'])}">'''
+    with LOG_LOCK:
+        if LOG_RENDER_TIMER:
+            LOG_RENDER_TIMER.cancel()
+            LOG_RENDER_TIMER = None
+
+        LOG_RENDER_AT = time.monotonic()
+
+        for block in LOG_BLOCKS.values():
+            if not block['dirty']:
+                continue
+
+            if block['widget'] is None:
+                block['widget'] = widgets.HTML()
+                LOG_LAYOUT_CHANGED = True
+
+            html = render_log_block(block)
+            block['widget'].value = html
+            block['dirty'] = False
+
+            LOG_WIDGET_STATS['bytes'] += len(html.encode())
+
+        # 블록이 추가되거나 제거됐을 때만 자식 목록을 바꿈 (위젯 ID 목록만 전송됨)
+        if LOG_LAYOUT_CHANGED:
+            LOG_WIDGET.children = tuple(
+                block['widget'] for block in LOG_BLOCKS.values())
+            LOG_LAYOUT_CHANGED = False
+
+            LOG_WIDGET_STATS['bytes'] += sum(
+                len(child.model_id) + 3 for child in LOG_WIDGET.children)
+
+        # 화면에서 빠진 블록의 위젯 닫기
+        while LOG_REMOVED_WIDGETS:
+            LOG_REMOVED_WIDGETS.pop().close()
+
+        LOG_WIDGET_STATS['renders'] += 1
+
+
+def render_log() -> None:
+    """
+    로그 위젯 렌더링을 예약합니다, 초당 `LOG_WIDGET_MAX_FPS` 번을 넘지 않도록 변경 사항을 모아서 렌더링합니다
+    """
+    global LOG_RENDER_TIMER
+
+    if not LOG_WIDGET:
+        return
+
+    with LOG_LOCK:
+        # 이미 렌더링이 예약됐다면 기다리기
+        if LOG_RENDER_TIMER:
+            return
+
+        delay = LOG_RENDER_AT + 1 / LOG_WIDGET_MAX_FPS - time.monotonic()
+        if delay <= 0:
+            flush_log()
+            return
+
+        LOG_RENDER_TIMER = threading.Timer(delay, flush_log)
+        LOG_RENDER_TIMER.daemon = True
+        LOG_RENDER_TIMER.start()
 
-    for block in LOG_BLOCKS:
-        styles = {
-            'display': 'inline-block',
-            **block['styles']
-        }
-        child_styles = {
-            'display': 'inline-block',
-            **block['child_styles']
-        }
 
-        html += f'<span style="{format_styles(styles)}">{block["msg"]}</span>\n'
+def remove_log_block(index: int) -> None:
+    """
+    로그 블록을 지우고 만들어진 위젯은 다음 렌더링에서 닫도록 예약합니다
+    """
+    global LOG_LAYOUT_CHANGED
+
+    with LOG_LOCK:
+        block = LOG_BLOCKS.pop(index)
+        if block['widget'] is not None:
+            LOG_REMOVED_WIDGETS.append(block['widget'])
+
+        LOG_LAYOUT_CHANGED = True
 
-        if block['max_childs'] is not None and len(block['childs']) > 0:
-            html += f'<div style="{format_styles(child_styles)}">'
-            html += ''.join(block['childs'][-block['max_childs']:])
-            html += '</div>'
 
-    html += '</div>'
+def update_log(
+    index: int,
+    styles: Optional[dict] = None,
+    max_childs: Union[int, None, bool] = False,
+    remove=False
+) -> None:
+    """
+    이미 만들어진 로그 블록의 스타일 등을 바꾸거나 블록을 제거합니다
+    """
+    with LOG_LOCK:
+        if index not in LOG_BLOCKS:
+            return
+
+        if remove:
+            remove_log_block(index)
+        else:
+            block = LOG_BLOCKS[index]
+            if styles:
+                block['styles'] = {**block['styles'], **styles}
+            if max_childs is not False:
+                block['max_childs'] = max_childs
+            block['dirty'] = True
 
-    LOG_WIDGET.value = html
+    render_log()
 
 
 def log(
@@ -417,6 +959,8 @@ def log(
     print_to_file=True,
     print_to_widget=True
 ) -> Optional[int]:
+    global LOG_LAYOUT_CHANGED
+
     # 기록할 내용이 ngrok API 키와 일치한다면 숨기기
     # TODO: 더 나은 문자열 검사, 원치 않은 내용이 가려질 수도 있음
     if OPTIONS['NGROK_API_TOKEN'] != '':
@@ -426,34 +970,50 @@ def log(
         msg += '\n'
 
     # 파일에 기록하기
+    # 한 줄씩 큐에 넣으므로 여러 프로세스가 동시에 실행돼도 줄이 섞이지 않음
     if print_to_file and LOG_FILE:
         if parent_index and msg.endswith('\n'):
-            LOG_FILE.write('\t')
-        LOG_FILE.write(msg)
-        LOG_FILE.flush()
+            emit_log('file', '\t' + msg)
+        elif not parent_index:
+            emit_log('file', datetime.now().strftime('[%H:%M:%S] ') + msg)
+        else:
+            emit_log('file', msg)
 
     # 로그 위젯에 기록하기
     if print_to_widget and LOG_WIDGET:
-        # 부모 로그가 없다면 새 블록 만들기
-        if parent or parent_index is None:
-            LOG_BLOCKS.append({
-                'msg': msg,
-                'styles': styles,
-                'childs': [],
-                'child_styles': child_styles,
-                'max_childs': max_childs
-            })
-            render_log()
-            return len(LOG_BLOCKS) - 1
-
-        # 부모 로그가 존재한다면 추가하기
-        if len(LOG_BLOCKS[parent_index]['childs']) > 100:
-            LOG_BLOCKS[parent_index]['childs'].pop(0)
-
-        LOG_BLOCKS[parent_index]['childs'].append(msg)
-        render_log()
-
-    print('\t' if parent_index else '' + msg, end='')
+        with LOG_LOCK:
+            # 부모 로그가 없다면 새 블록 만들기
+            if parent or parent_index is None:
+                index = next(LOG_BLOCK_IDS)
+                LOG_BLOCKS[index] = {
+                    'msg': msg,
+                    'styles': styles,
+                    'childs': deque(maxlen=LOG_WIDGET_MAX_CHILDS),
+                    'child_styles': child_styles,
+                    'max_childs': max_childs,
+                    'widget': None,
+                    'dirty': True
+                }
+
+                # 오래된 블록부터 제거해 스크롤백 크기 제한하기
+                while len(LOG_BLOCKS) > LOG_WIDGET_MAX_BLOCKS:
+                    remove_log_block(next(iter(LOG_BLOCKS)))
+
+                LOG_LAYOUT_CHANGED = True
+                render_log()
+                return index
+
+            # 부모 로그가 존재한다면 추가하기 (스크롤백에서 밀려난 블록이면 무시하기)
+            block = LOG_BLOCKS.get(parent_index)
+            if block:
+                block['childs'].append(msg)
+
+                # 자식 로그가 표시되는 블록만 다시 렌더링하기
+                if block['max_childs'] is not None:
+                    block['dirty'] = True
+                    render_log()
+
+    emit_log('stdout', ('\t' if parent_index else '') + msg)
 
 
 def log_trace() -> None:
@@ -512,6 +1072,55 @@ def alert(message: str, unassign=False):
 # ==============================
 # 서브 프로세스
 # ==============================
+class OutputCapture:
+    """
+    프로세스 출력을 보관하는 버퍼
+
+    - `True`: 모든 출력 보관하기
+    - `False`, `None`: 보관하지 않기
+    - `int`: 마지막 N 글자만 보관하기 (링 버퍼)
+    - 경로: 메모리에 보관하지 않고 파일에 기록하기
+    """
+
+    def __init__(self, mode: Union[bool, int, str, os.PathLike, None] = True) -> None:
+        self.lines = deque()
+        self.size = 0
+        self.limit: Optional[int] = None
+        self.file: Optional[io.TextIOWrapper] = None
+        self.enabled = True
+
+        if mode is None or isinstance(mode, bool):
+            self.enabled = bool(mode)
+        elif isinstance(mode, int):
+            self.limit = mode
+        else:
+            Path(mode).parent.mkdir(0o777, True, True)
+            self.file = open(mode, 'a')
+
+    def append(self, line: str) -> None:
+        if self.file:
+            self.file.write(line)
+            return
+
+        if not self.enabled:
+            return
+
+        self.lines.append(line)
+        self.size += len(line)
+
+        # 제한된 크기를 넘어가면 오래된 줄부터 버리기
+        if self.limit is not None:
+            while self.size > self.limit and len(self.lines) > 1:
+                self.size -= len(self.lines.popleft())
+
+    def getvalue(self) -> str:
+        return ''.join(self.lines)
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+
+
 def execute(
     args: Union[str, List[str]],
     parser: Optional[
@@ -521,85 +1130,111 @@ def execute(
     hide_summary=False,
     print_to_file=True,
     print_to_widget=True,
+    capture: Union[bool, int, str, os.PathLike, None] = True,
     **kwargs
 ) -> Tuple[str, int]:
+    """
+    프로세스를 실행하고 출력을 로그에 실시간으로 기록합니다
+
+    `capture` 로 반환할 출력을 얼마나 보관할지 정할 수 있음 (`OutputCapture` 참고),
+    보관 여부와 상관 없이 `parser` 에는 모든 줄이 전달됨
+    """
     if isinstance(args, str) and 'shell' not in kwargs:
         kwargs['shell'] = True
 
-    # 서브 프로세스 만들기
-    p = subprocess.Popen(
-        args,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        encoding='utf-8',
-        **kwargs)
-
-    # 로그에 시작한 프로세스 정보 출력하기
     formatted_args = args if isinstance(args, str) else ' '.join(args)
-    summary = formatted_args if summary is None else f'{summary}\n   {formatted_args}'
 
-    log_index = log(
-        f'=> {summary}',
-        styles={'color': 'yellow'},
-        max_childs=10)
+    with trace('execute', 'process', args=formatted_args, summary=summary) as span:
+        # 서브 프로세스 만들기
+        p = subprocess.Popen(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            encoding='utf-8',
+            errors='replace',
+            **kwargs)
+
+        # 로그에 시작한 프로세스 정보 출력하기
+        summary = formatted_args if summary is None else f'{summary}\n   {formatted_args}'
+
+        log_index = log(
+            f'=> {summary}',
+            styles={'color': 'yellow'},
+            max_childs=10)
 
-    output = ''
+        output = OutputCapture(capture)
 
-    # 프로세스 출력 위젯에 리다이렉션하기
-    while p.poll() is None:
-        # 출력이 비어있다면 넘어가기
+        # 프로세스 출력 위젯에 리다이렉션하기
+        # 파이프가 닫힐 때(EOF)까지 읽으므로 종료 직전에 출력된 줄도 빠짐없이 가져오며
+        # 읽을 내용이 없을 땐 readline 에서 대기하므로 CPU 를 낭비하지 않음
         assert p.stdout
-        line = p.stdout.readline()
-        if not line:
-            continue
+        for line in p.stdout:
+            # 프로세스 출력 버퍼에 추가하기
+            output.append(line)
+
+            # 파서 함수 실행하기
+            if callable(parser):
+                parser(line)
+
+            # 프로세스 출력 로그하기
+            log(
+                line,
+                newline=False,
+                parent_index=log_index,
+                print_to_file=print_to_file,
+                print_to_widget=print_to_widget)
+
+        # 변수 정리하기
+        p.stdout.close()
+        output.close()
+        rc = p.wait()
+        span['rc'] = rc
+
+        # pip 로 패키지를 설치했다면 캐시된 패키지 확인 결과 비우기
+        if is_pip_install(args):
+            invalidate_python_packages()
+
+        # 로그 블록 업데이트
+        if LOG_WIDGET:
+            assert log_index
+
+            if hide_summary:
+                # 현재 로그 블록 숨기기 (제거하기)
+                update_log(log_index, remove=True)
+            elif rc == 0:
+                # 현재 로그 텍스트 초록색으로 변경하고 프로세스 출력 숨기기
+                update_log(log_index, {'color': 'green'}, max_childs=None)
+            else:
+                # 현재 로그 텍스트 빨간색으로 변경하고 프로세스 출력 모두 표시하기
+                update_log(log_index, {'color': 'red'}, max_childs=0)
 
-        # 프로세스 출력 버퍼에 추가하기
-        output += line
+        # 오류 코드를 반환했다면
+        if rc != 0:
+            if isinstance(rc, signal.Signals):
+                rc = rc.value
 
-        # 파서 함수 실행하기
-        if callable(parser):
-            parser(line)
+            raise subprocess.CalledProcessError(rc, args)
 
-        # 프로세스 출력 로그하기
-        log(
-            line,
-            newline=False,
-            parent_index=log_index,
-            print_to_file=print_to_file,
-            print_to_widget=print_to_widget)
-
-    # 변수 정리하기
-    rc = p.poll()
-    assert rc is not None
-
-    # 로그 블록 업데이트
-    if LOG_WIDGET:
-        assert log_index
-
-        if rc == 0:
-            # 현재 로그 텍스트 초록색으로 변경하고 프로세스 출력 숨기기
-            LOG_BLOCKS[log_index]['styles']['color'] = 'green'
-            LOG_BLOCKS[log_index]['max_childs'] = None
-        else:
-            # 현재 로그 텍스트 빨간색으로 변경하고 프로세스 출력 모두 표시하기
-            LOG_BLOCKS[log_index]['styles']['color'] = 'red'
-            LOG_BLOCKS[log_index]['max_childs'] = 0
+    return output.getvalue(), rc
 
-        if hide_summary:
-            # 현재 로그 블록 숨기기 (제거하기)
-            del LOG_BLOCKS[log_index]
 
-        # 로그 블록 렌더링
-        render_log()
+def run_parallel(tasks: List[Callable[[], T]], max_workers=4) -> List[T]:
+    """
+    서로 의존하지 않는 작업들을 스레드에서 동시에 실행하고 결과를 순서대로 반환합니다
+
+    `execute()` 는 호출마다 로그 블록을 따로 만들기 때문에 apt, pip, git, 다운로드처럼
+    출력이 많은 프로세스를 동시에 실행해도 로그가 섞이지 않음
+    """
+    if len(tasks) < 2:
+        return [task() for task in tasks]
 
-    # 오류 코드를 반환했다면
-    if rc != 0:
-        if isinstance(rc, signal.Signals):
-            rc = rc.value
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(task) for task in tasks]
 
-        raise subprocess.CalledProcessError(rc, args)
+        # 하나가 실패해도 나머지 작업은 끝까지 기다린 뒤 첫 오류를 다시 던짐
+        wait(futures)
+        return [future.result() for future in futures]
 
-    return output, rc
 
 # ==============================
 # 작업 경로
@@ -615,97 +1250,1808 @@ def delete(path: os.PathLike) -> None:
         shutil.rmtree(path, ignore_errors=True)
 
 
-def has_python_package(pkg: str, executable: Optional[str] = None) -> bool:
-    if not executable:
-        return find_spec(pkg) is not None
+# 인터프리터마다 확인한 패키지 버전 (설치되지 않았다면 None), pip 로 패키지를 설치하면 비워짐
+PYTHON_PACKAGES: Dict[str, Dict[str, Optional[str]]] = {}
+PYTHON_PACKAGES_LOCK = threading.Lock()
 
-    _, rc = execute(
-        [
-            executable, '-c',
-            f'''
-            import importlib
-            import sys
-            sys.exit(0 if importlib.find_loader({shlex.quote(pkg)}) else 0)
-            '''
-        ])
+# 다른 인터프리터에서 실행해 인자로 받은 패키지들의 설치 여부와 버전을 JSON 으로 출력하는 코드
+PYTHON_PACKAGES_PROBE = '''
+import json
+import sys
+from importlib.util import find_spec
 
-    return True if rc == 0 else False
+try:
+    from importlib.metadata import version
+except ImportError:
+    version = None
 
+result = {}
+for name in sys.argv[1:]:
+    try:
+        spec = find_spec(name)
+    except (ImportError, ValueError):
+        spec = None
 
-# ==============================
-# 파일 다운로드
-# ==============================
-def download(url: str, target: Optional[str] = None, ignore_aria2=False, **kwargs):
-    if not target:
-        # TODO: 경로 중 params 제거하기
-        target = url.split('/')[-1]
+    if spec is None:
+        result[name] = None
+        continue
 
-    # 파일을 받을 디렉터리 만들기
-    Path(target).parent.mkdir(0o777, True, True)
+    try:
+        result[name] = version(name) if version else ''
+    except Exception:
+        result[name] = ''
 
-    # 빠른 다운로드를 위해 aria2 패키지 설치 시도하기
-    if not ignore_aria2:
-        if not find_executable('aria2c') and find_executable('apt'):
-            execute(['apt', 'install', 'aria2'])
+print(json.dumps(result))
+'''
 
-        if find_executable('aria2c'):
-            p = Path(target)
-            execute(
-                [
-                    'aria2c',
-                    '--continue',
-                    '--always-resume',
-                    '--summary-interval', '10',
-                    '--disk-cache', '64M',
-                    '--min-split-size', '8M',
-                    '--max-concurrent-downloads', '8',
-                    '--max-connection-per-server', '8',
-                    '--max-overall-download-limit', '0',
-                    '--max-download-limit', '0',
-                    '--split', '8',
+
+def is_pip_install(args: Union[str, List[str]]) -> bool:
+    tokens = shlex.split(args) if isinstance(args, str) else [str(arg) for arg in args]
+
+    return 'install' in tokens and any(
+        Path(token).name in ('pip', 'pip3') or token == 'pip'
+        for token in tokens
+    )
+
+
+def invalidate_python_packages() -> None:
+    with PYTHON_PACKAGES_LOCK:
+        PYTHON_PACKAGES.clear()
+
+    # 현재 인터프리터에서 새로 설치된 패키지를 찾을 수 있도록 하기
+    importlib.invalidate_caches()
+
+
+def probe_python_packages(packages: List[str], executable: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """
+    패키지들의 설치 여부와 버전을 한 번에 확인합니다, 설치되지 않은 패키지는 None 을 값으로 가짐
+
+    다른 인터프리터는 확인하지 않은 패키지를 모아 한 번만 실행하고 결과는 pip 로 설치하기 전까지 캐시함
+    """
+    key = executable or sys.executable
+
+    with PYTHON_PACKAGES_LOCK:
+        cache = PYTHON_PACKAGES.setdefault(key, {})
+        missing = [pkg for pkg in packages if pkg not in cache]
+
+    if missing:
+        if executable:
+            output = subprocess.check_output(
+                [executable, '-c', PYTHON_PACKAGES_PROBE, *missing],
+                text=True)
+            result = json.loads(output)
+        else:
+            # 현재 인터프리터라면 프로세스를 만들지 않고 바로 확인하기
+            from importlib.metadata import PackageNotFoundError, version
+
+            result = {}
+            for pkg in missing:
+                try:
+                    spec = find_spec(pkg)
+                except (ImportError, ValueError):
+                    spec = None
+
+                if spec is None:
+                    result[pkg] = None
+                    continue
+
+                try:
+                    result[pkg] = version(pkg)
+                except PackageNotFoundError:
+                    result[pkg] = ''
+
+        with PYTHON_PACKAGES_LOCK:
+            cache.update(result)
+
+    return {pkg: cache[pkg] for pkg in packages}
+
+
+def has_python_package(pkg: str, executable: Optional[str] = None) -> bool:
+    return probe_python_packages([pkg], executable)[pkg] is not None
+
+
+def pip_cache_dir() -> Path:
+    return Path(WORKSPACE, 'cache', 'pip').resolve()
+
+
+def wheelhouse_dir() -> Path:
+    return pip_cache_dir().joinpath('wheelhouse')
+
+
+def list_pip_packages() -> Dict[str, str]:
+    output = subprocess.check_output(['pip', 'list', '--format=json'], text=True)
+    return {item['name'].lower(): item['version'] for item in json.loads(output)}
+
+
+def fill_wheelhouse(requirements: List[str]) -> None:
+    """
+    설치한 패키지의 wheel 을 백그라운드에서 wheelhouse 에 받아둡니다
+
+    받다가 런타임이 종료돼도 wheelhouse 에 깨진 파일이 남지 않도록 임시 디렉터리에 받은 뒤 옮김
+    """
+    wheelhouse = wheelhouse_dir()
+
+    def run():
+        with tempfile.TemporaryDirectory() as temp_dir:
+            p = subprocess.run(
+                ['pip', 'wheel', '--no-deps', '--wheel-dir', temp_dir, *requirements],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                env={**os.environ, 'PIP_CACHE_DIR': str(pip_cache_dir())})
+
+            if p.returncode != 0:
+                log(f'wheelhouse 에 패키지를 받지 못했습니다: {p.stderr.strip()}', print_to_widget=False)
+                return
+
+            for path in Path(temp_dir).iterdir():
+                shutil.copyfile(path, wheelhouse.joinpath(path.name + '.tmp'))
+                os.replace(wheelhouse.joinpath(path.name + '.tmp'), wheelhouse.joinpath(path.name))
+
+        log(f'{len(requirements)}개 패키지를 wheelhouse 에 받았습니다', print_to_widget=False)
+
+    threading.Thread(target=run, name='wheelhouse', daemon=True).start()
+
+
+def pip_install(*packages: str) -> None:
+    """
+    작업 디렉터리의 wheelhouse 에서 패키지를 설치합니다
+
+    필요한 wheel 이 모두 있다면 네트워크 없이 설치하고
+    아니라면 평소처럼 설치한 뒤 새로 설치된 패키지만 백그라운드에서 wheelhouse 에 받아두므로
+    다음 런타임부터는 오프라인으로 설치됨
+    """
+    wheelhouse = wheelhouse_dir()
+    wheelhouse.mkdir(0o777, True, True)
+
+    # 캐시된 wheel 만으로 설치해보기
+    p = subprocess.run(
+        ['pip', 'install', '--no-index', '--find-links', str(wheelhouse), *packages],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL)
+    invalidate_python_packages()
+
+    if p.returncode == 0:
+        log(f'wheelhouse 에서 {" ".join(packages)} 패키지를 설치했습니다')
+        return
+
+    # 이미 설치된 패키지는 wheelhouse 에 받지 않도록 설치 전후를 비교하기
+    before = list_pip_packages()
+
+    execute(
+        ['pip', 'install', '--find-links', str(wheelhouse), *packages],
+        summary=f'{" ".join(packages)} 패키지를 설치합니다',
+        env={**os.environ, 'PIP_CACHE_DIR': str(pip_cache_dir())})
+
+    installed = [
+        f'{name}=={version}'
+        for name, version in list_pip_packages().items()
+        if before.get(name) != version
+    ]
+
+    if installed:
+        fill_wheelhouse(installed)
+
+
+# ==============================
+# 모델 저장소
+# ==============================
+# 모델 파일 색인 (models/.store/index.json), 매번 구글 드라이브 전체를 훑지 않도록 디렉터리 수정 시간이 바뀐 곳만 다시 읽음
+# 모델 다운로더 노트북도 이 색인으로 이미 받은 파일을 표시함
+# {
+#   'files': { 'Stable-diffusion/model.safetensors': { 'size': 0, 'mtime': 0.0, 'sha256': '...', 'partial': False } },
+#   'dirs': { 'Stable-diffusion': { 'mtime': 0.0, 'dirs': ['subdir'], 'extras': ['model.yaml'] } }
+# }
+MODEL_SUFFIXES = ('.ckpt', '.safetensors', '.pt', '.pth', '.bin')
+MODEL_TEMP_SUFFIXES = ('.aria2', '.parts', '.tmp', '.uploading', '.caching', '.linking')  # 받거나 옮기는 중인 임시 파일
+MODEL_INDEX_LOCK = threading.RLock()
+
+
+def models_dir() -> Path:
+    return Path(WORKSPACE).resolve().joinpath('models')
+
+
+def model_store_dir() -> Path:
+    """
+    해시 값을 파일 이름으로 사용하는 모델 원본 저장소, 사용자가 보는 파일은 이곳을 가리키는 링크임
+    """
+    return models_dir().joinpath('.store')
+
+
+def load_model_index() -> Dict[str, dict]:
+    path = model_store_dir().joinpath('index.json')
+
+    try:
+        with path.open('r') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        index = {}
+
+    index.setdefault('files', {})
+    index.setdefault('dirs', {})
+    return index
+
+
+def save_model_index(index: Dict[str, dict]) -> None:
+    path = model_store_dir().joinpath('index.json')
+    path.parent.mkdir(0o777, True, True)
+
+    # 기록 중에 런타임이 종료돼도 색인이 깨지지 않도록 임시 파일에 쓴 뒤 교체하기
+    temp_path = path.with_suffix('.tmp')
+    with temp_path.open('w') as file:
+        json.dump(index, file, indent=1)
+    os.replace(temp_path, path)
+
+
+def hash_file(path: os.PathLike, chunk_size=16 * 1024 * 1024) -> str:
+    import hashlib
+
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+def update_model_index(hash_missing=False) -> Dict[str, dict]:
+    """
+    모델 디렉터리를 훑어 색인을 갱신하고 파일 목록을 반환합니다
+
+    디렉터리의 수정 시간이 그대로라면 파일 목록도 그대로이므로 하위 디렉터리만 확인하며
+    `hash_missing` 이 참이면 해시 값이 없는 파일의 해시를 계산함
+    """
+    root = models_dir()
+
+    with MODEL_INDEX_LOCK:
+        index = load_model_index()
+        files: Dict[str, dict] = index['files']
+        dirs: Dict[str, dict] = index['dirs']
+        changed = False
+
+        def direct_files(prefix: str) -> List[str]:
+            return [
+                key for key in files
+                if key.startswith(prefix) and '/' not in key[len(prefix):]
+            ]
+
+        def forget(rel: str) -> None:
+            nonlocal changed
+
+            prefix = '' if rel == '.' else rel + '/'
+            for key in direct_files(prefix):
+                del files[key]
+            for name in dirs.pop(rel, {}).get('dirs', []):
+                forget(prefix + name)
+            changed = True
+
+        def scan(rel: str) -> None:
+            nonlocal changed
+
+            path = root if rel == '.' else root.joinpath(rel)
+            prefix = '' if rel == '.' else rel + '/'
+
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                forget(rel)
+                return
+
+            cached = dirs.get(rel)
+
+            # 목록이 바뀌지 않은 디렉터리는 하위 디렉터리만 확인하기
+            if cached and cached['mtime'] == mtime and 'extras' in cached:
+                for name in cached['dirs']:
+                    scan(prefix + name)
+                return
+
+            with os.scandir(path) as it:
+                entries = list(it)
+
+            subdirs = []
+            extras = []
+            names = {entry.name for entry in entries}
+
+            for entry in entries:
+                # 저장소 원본은 링크를 통해 색인되므로 건너뛰기
+                if entry.name == '.store':
+                    continue
+
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                    scan(prefix + entry.name)
+                    continue
+
+                # 체크포인트와 함께 사용하는 설정 파일 등은 이름만 기록하기
+                if not entry.name.endswith(MODEL_SUFFIXES):
+                    if not entry.name.endswith(MODEL_TEMP_SUFFIXES):
+                        extras.append(entry.name)
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                key = prefix + entry.name
+                old = files.get(key)
+                if old and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime:
+                    sha256 = old['sha256']
+                else:
+                    sha256 = None
+
+                files[key] = {
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
+                    'sha256': sha256,
+                    # aria2 나 fetch_ranged() 로 받다만 파일
+                    'partial': entry.name + '.aria2' in names or entry.name + '.parts' in names
+                }
+
+            # 사라진 파일과 디렉터리 색인에서 지우기
+            for key in direct_files(prefix):
+                if key[len(prefix):] not in names:
+                    del files[key]
+            for name in (cached or {}).get('dirs', []):
+                if name not in subdirs:
+                    forget(prefix + name)
+
+            dirs[rel] = {'mtime': mtime, 'dirs': subdirs, 'extras': extras}
+            changed = True
+
+        root.mkdir(0o777, True, True)
+        scan('.')
+
+        if hash_missing:
+            for key, entry in files.items():
+                if entry['sha256'] or entry['partial']:
+                    continue
+
+                with trace('hash', 'model', path=key, bytes=entry['size']):
+                    entry['sha256'] = hash_file(root.joinpath(key))
+                changed = True
+
+        if changed:
+            save_model_index(index)
+
+        return files
+
+
+def record_model(path: os.PathLike, sha256: str) -> None:
+    """
+    해시 값을 이미 알고 있는 파일을 색인에 추가합니다
+    """
+    # 심볼릭 링크는 원본이 아닌 링크 자체의 경로로 색인하기
+    path = Path(path).parent.resolve().joinpath(Path(path).name)
+
+    try:
+        key = str(path.relative_to(models_dir()))
+    except ValueError:
+        return
+
+    stat = path.stat()
+
+    with MODEL_INDEX_LOCK:
+        index = load_model_index()
+        index['files'][key] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': sha256.lower(),
+            'partial': False
+        }
+        save_model_index(index)
+
+
+def find_model(sha256: str) -> Optional[Path]:
+    """
+    해시 값이 일치하는 모델 파일이 이미 존재한다면 경로를 반환합니다
+    """
+    sha256 = sha256.lower()
+
+    blob = model_store_dir().joinpath(sha256)
+    if blob.is_file():
+        return blob
+
+    root = models_dir()
+    for key, entry in update_model_index().items():
+        if entry['sha256'] != sha256:
+            continue
+
+        path = root.joinpath(key)
+        if path.is_file() and path.stat().st_size == entry['size']:
+            return path
+
+    return None
+
+
+def link_model(source: os.PathLike, target: os.PathLike) -> str:
+    """
+    하드 링크, 심볼릭 링크 순서로 시도하고 둘 다 지원하지 않는 파일 시스템이라면 복사합니다
+    """
+    source = Path(source).resolve()
+    target = Path(target)
+    target.parent.mkdir(0o777, True, True)
+
+    if target.exists() or target.is_symlink():
+        target.unlink()
+
+    try:
+        os.link(source, target)
+        return 'hardlink'
+    except OSError:
+        pass
+
+    try:
+        target.symlink_to(source)
+        return 'symlink'
+    except OSError:
+        pass
+
+    shutil.copyfile(source, target)
+    return 'copy'
+
+
+def supports_links(directory: os.PathLike) -> bool:
+    """
+    구글 드라이브처럼 링크를 만들 수 없는 파일 시스템인지 확인합니다
+    """
+    probe = Path(directory, '.link-probe')
+    link = Path(directory, '.link-probe-link')
+
+    try:
+        probe.touch()
+        return link_model(probe, link) != 'copy'
+    finally:
+        for path in (probe, link):
+            if path.exists() or path.is_symlink():
+                path.unlink()
+
+
+def dedupe_models() -> None:
+    """
+    내용이 같은 모델 파일들을 저장소의 원본 하나를 가리키는 링크로 바꿉니다
+    """
+    root = models_dir()
+    store = model_store_dir()
+    store.mkdir(0o777, True, True)
+
+    if not supports_links(store):
+        log('파일 시스템이 링크를 지원하지 않아 중복 파일을 정리하지 않습니다', styles={'color': 'red'})
+        return
+
+    groups: Dict[str, List[str]] = {}
+    for key, entry in update_model_index(hash_missing=True).items():
+        # 받다 만 파일은 해시 값이 없고 내용도 바뀌므로 건너뛰기
+        if entry['partial'] or not entry['sha256']:
+            continue
+
+        path = root.joinpath(key)
+
+        # 이미 링크인 파일은 정리할 필요가 없음, 색인한 뒤에 사라진 파일도 건너뛰기
+        try:
+            if path.is_symlink() or path.stat().st_nlink > 1:
+                continue
+        except FileNotFoundError:
+            continue
+
+        groups.setdefault(entry['sha256'], []).append(key)
+
+    saved = 0
+    for sha256, keys in groups.items():
+        blob = store.joinpath(sha256)
+
+        if not blob.exists():
+            # 중복되지 않은 파일은 그대로 두기
+            if len(keys) < 2:
+                continue
+
+            # 첫 번째 파일을 원본으로 옮기기, 그 사이에 사라졌다면 이 그룹은 다음에 정리하기
+            try:
+                os.replace(root.joinpath(keys[0]), blob)
+            except FileNotFoundError:
+                continue
+
+            link_model(blob, root.joinpath(keys[0]))
+            record_model(root.joinpath(keys[0]), sha256)
+            keys = keys[1:]
+
+        # 정리하는 도중에 파일이 사라지더라도 나머지 파일은 계속 정리하기
+        for key in keys:
+            path = root.joinpath(key)
+
+            try:
+                size = path.stat().st_size
+                link_model(blob, path)
+            except OSError as e:
+                log(f'{key} 파일을 정리하지 못했습니다: {e}', print_to_widget=False)
+                continue
+
+            record_model(path, sha256)
+            saved += size
+
+    if saved:
+        log(f'중복된 모델 파일을 정리해 {saved / 1024 ** 3:.2f}GB 를 확보했습니다')
+
+
+# ==============================
+# 구글 드라이브 업로드
+# ==============================
+# 구글 드라이브 FUSE 에 바로 받으면 느리므로 로컬 디스크에 먼저 받은 뒤 백그라운드에서 옮김
+STAGING_DIR = Path('/content/staging')
+UPLOAD_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='upload')
+UPLOAD_FUTURES: List[Future] = []
+UPLOAD_FAILED: List[Path] = []  # 옮기지 못해 로컬 디스크에 남겨둔 파일, 같은 파일을 다시 받을 때 받지 않고 옮기기만 함
+
+
+def staging_path(target: os.PathLike) -> Optional[Path]:
+    """
+    구글 드라이브에 저장될 파일이라면 로컬 디스크에 먼저 받을 경로를 반환합니다
+    """
+    if not IN_COLAB or not OPTIONS['USE_GOOGLE_DRIVE']:
+        return None
+
+    target = Path(target).parent.resolve().joinpath(Path(target).name)
+    if not str(target).startswith('/content/drive/'):
+        return None
+
+    # 이미 존재하는 파일은 aria2 의 이어받기 기능을 그대로 사용하기
+    if target.exists():
+        return None
+
+    import hashlib
+    key = hashlib.md5(str(target).encode()).hexdigest()[:12]
+
+    return STAGING_DIR.joinpath(key, target.name)
+
+
+def upload(source: os.PathLike, target: os.PathLike, sha256: Optional[str] = None) -> Future:
+    """
+    로컬 디스크에 받은 파일을 백그라운드에서 구글 드라이브로 옮깁니다
+    """
+    source = Path(source)
+    target = Path(target)
+
+    def run():
+        with trace('upload', 'upload', target=str(target), bytes=source.stat().st_size):
+            # 옮기는 도중에 런타임이 종료돼도 완전한 파일로 보이지 않도록 임시 이름으로 복사하기
+            temp = target.with_name(target.name + '.uploading')
+
+            # 구글 드라이브 용량이 부족한 경우 등에는 받은 파일을 지우지 않고 남겨두기
+            try:
+                shutil.copyfile(source, temp)
+                os.replace(temp, target)
+            except Exception as e:
+                try:
+                    temp.unlink(missing_ok=True)
+                except OSError:
+                    pass
+
+                UPLOAD_FAILED.append(source)
+                log(f'구글 드라이브로 옮기지 못했습니다, 받은 파일은 {source} 에 남겨둡니다: {e}', styles={'color': 'red'})
+                raise
+
+            source.unlink()
+
+        if sha256:
+            record_model(target, sha256)
+
+        log(f'구글 드라이브로 옮겼습니다: {target}')
+
+    future = UPLOAD_POOL.submit(run)
+    UPLOAD_FUTURES.append(future)
+    return future
+
+
+def wait_uploads() -> None:
+    if UPLOAD_FUTURES:
+        log(f'구글 드라이브로 옮기는 중인 파일 {len(UPLOAD_FUTURES)}개를 기다립니다')
+
+    # 실패한 파일은 옮기는 작업에서 기록했으므로 나머지 작업을 멈추지 않고 계속 기다리기
+    while UPLOAD_FUTURES:
+        UPLOAD_FUTURES.pop(0).exception()
+
+
+# ==============================
+# 로컬 데이터 디렉터리
+# ==============================
+# WebUI 가 구글 드라이브 FUSE 에 바로 쓰지 않도록 로컬 디스크의 데이터 디렉터리를 사용하고
+# 바뀐 파일은 백그라운드에서 모아서 구글 드라이브에 반영함
+LOCAL_DATA_DIR = Path('/content/data')
+# 복사하지 않고 구글 드라이브에 심볼릭 링크로 연결할 디렉터리
+# 용량이 크거나 부팅하는 동안 모델 목록(models.json)에 따라 새 파일을 받는 디렉터리임
+LOCAL_DATA_LINKS = ('models', 'embeddings')
+LOCAL_DATA_SKIP = ('cache', 'logs', 'outputs')  # 부팅할 때 복사하지 않을 디렉터리, outputs 는 새 파일만 반영함
+LOCAL_DATA_SYNC_INTERVAL = 30  # 바뀐 파일을 확인하는 주기 (초)
+LOCAL_DATA_SYNC_DEBOUNCE = 5  # 마지막으로 수정된 뒤 이 시간(초)이 지난 파일만 반영하기
+LOCAL_DATA_STATE: Dict[str, Tuple[int, int]] = {}  # 구글 드라이브에 반영된 파일의 (크기, 수정 시간)
+LOCAL_DATA_LOCK = threading.Lock()
+LOCAL_DATA_STOP = threading.Event()
+LOCAL_DATA_THREAD: Optional[threading.Thread] = None
+
+
+def use_local_data_dir() -> bool:
+    return IN_COLAB and OPTIONS['USE_GOOGLE_DRIVE'] and OPTIONS['USE_LOCAL_DATA_DIR']
+
+
+def scan_local_data() -> Dict[str, Tuple[int, int]]:
+    files = {}
+
+    for root, dirs, names in os.walk(LOCAL_DATA_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+
+            try:
+                stat = os.lstat(path)
+            except FileNotFoundError:
+                continue
+
+            # 심볼릭 링크는 구글 드라이브에 이미 있는 파일이므로 무시하기
+            if os.path.islink(path):
+                continue
+
+            files[os.path.relpath(path, LOCAL_DATA_DIR)] = (stat.st_size, stat.st_mtime_ns)
+
+    return files
+
+
+def setup_local_data_dir() -> None:
+    """
+    구글 드라이브의 작업 디렉터리를 로컬 디스크에 복사하고 백그라운드 동기화를 시작합니다
+    """
+    global LOCAL_DATA_THREAD
+
+    if not use_local_data_dir():
+        return
+
+    workspace = Path(WORKSPACE).resolve()
+    LOCAL_DATA_DIR.mkdir(0o777, True, True)
+
+    for name in LOCAL_DATA_LINKS:
+        source = workspace.joinpath(name)
+        source.mkdir(0o777, True, True)
+
+        link = LOCAL_DATA_DIR.joinpath(name)
+        if not link.is_symlink():
+            delete(link)
+            link.symlink_to(source, target_is_directory=True)
+
+    skip = (*LOCAL_DATA_LINKS, *LOCAL_DATA_SKIP)
+
+    with trace('hydrate_data', 'data'):
+        if find_executable('rsync'):
+            execute(
+                [
+                    'rsync', '-a',
+                    *(f'--exclude=/{name}' for name in skip),
+                    f'{workspace}/', f'{LOCAL_DATA_DIR}/'
+                ],
+                summary='구글 드라이브의 데이터를 로컬 디스크로 복사합니다')
+        else:
+            for entry in os.scandir(workspace):
+                if entry.name in skip:
+                    continue
+
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.copytree(entry.path, LOCAL_DATA_DIR.joinpath(entry.name), symlinks=True, dirs_exist_ok=True)
+                else:
+                    shutil.copy2(entry.path, LOCAL_DATA_DIR.joinpath(entry.name), follow_symlinks=False)
+
+    with LOCAL_DATA_LOCK:
+        LOCAL_DATA_STATE.update(scan_local_data())
+
+    def worker():
+        while not LOCAL_DATA_STOP.wait(LOCAL_DATA_SYNC_INTERVAL):
+            try:
+                sync_local_data()
+            except Exception as e:
+                log(f'구글 드라이브에 데이터를 반영하지 못했습니다: {e}', styles={'color': 'red'})
+
+    LOCAL_DATA_THREAD = threading.Thread(target=worker, name='local-data-sync', daemon=True)
+    LOCAL_DATA_THREAD.start()
+
+
+def sync_local_data(final=False) -> int:
+    """
+    로컬 데이터 디렉터리에서 바뀐 파일들을 한 번에 구글 드라이브에 반영하고 반영한 파일 수를 반환합니다
+
+    `final` 이 아니라면 아직 쓰는 중일 수도 있는 최근에 수정된 파일은 다음 주기로 미룸
+    지워진 파일은 구글 드라이브에서 지우지 않음
+    """
+    workspace = Path(WORKSPACE).resolve()
+
+    with LOCAL_DATA_LOCK:
+        deadline = time.time_ns() - LOCAL_DATA_SYNC_DEBOUNCE * 10 ** 9
+        files = scan_local_data()
+        changed = [
+            path for path, state in files.items()
+            if LOCAL_DATA_STATE.get(path) != state and (final or state[1] < deadline)
+        ]
+
+        if not changed:
+            return 0
+
+        with trace('sync_data', 'data', files=len(changed)):
+            if find_executable('rsync'):
+                subprocess.run(
+                    ['rsync', '-a', '--files-from=-', f'{LOCAL_DATA_DIR}/', f'{workspace}/'],
+                    input='\n'.join(changed),
+                    text=True,
+                    check=True)
+            else:
+                for path in changed:
+                    target = workspace.joinpath(path)
+                    target.parent.mkdir(0o777, True, True)
+
+                    # 복사가 중간에 끊겨도 기존 파일이 망가지지 않도록 임시 파일에 쓴 뒤 바꾸기
+                    temp_path = target.with_name(target.name + '.syncing')
+                    shutil.copy2(LOCAL_DATA_DIR.joinpath(path), temp_path)
+                    os.replace(temp_path, target)
+
+        for path in changed:
+            LOCAL_DATA_STATE[path] = files[path]
+
+    log(f'{len(changed)}개 파일을 구글 드라이브에 반영했습니다', print_to_widget=final)
+    return len(changed)
+
+
+def stop_local_data_sync() -> None:
+    """
+    백그라운드 동기화를 멈추고 남은 파일을 모두 구글 드라이브에 반영합니다
+    """
+    if not LOCAL_DATA_THREAD:
+        return
+
+    LOCAL_DATA_STOP.set()
+    LOCAL_DATA_THREAD.join()
+
+    try:
+        sync_local_data(final=True)
+    except Exception as e:
+        log(f'구글 드라이브에 데이터를 반영하지 못했습니다: {e}', styles={'color': 'red'})
+
+
+# ==============================
+# 모델 캐시
+# ==============================
+# 구글 드라이브의 체크포인트와 VAE 중 자주 사용하는 파일을 로컬 디스크에 복사해두고
+# WebUI 에는 로컬 사본이나 구글 드라이브 원본을 가리키는 심볼릭 링크로 이뤄진 디렉터리를 넘김
+MODEL_CACHE_DIR = Path('/content/model-cache')
+MODEL_VIEW_DIR = Path('/content/model-view')
+MODEL_CACHE_DIRS = ('Stable-diffusion', 'VAE')
+MODEL_CACHE_MIN_FREE = 5 * 1024 ** 3  # 캐시를 채운 뒤에도 남겨둘 최소 디스크 여유 공간
+MODEL_CACHE_HALF_LIFE = 7 * 24 * 60 * 60  # 사용 횟수가 절반으로 줄어드는 시간 (초)
+MODEL_CACHE_REFRESH_INTERVAL = 60  # 구글 드라이브에 새로 추가된 파일을 링크하는 주기 (초)
+MODEL_VIEW_ADOPT_DELAY = 30  # WebUI 가 저장한 파일을 마지막으로 수정된 뒤 이 시간(초)이 지나면 구글 드라이브로 옮김
+MODEL_CACHE_LOCK = threading.RLock()
+MODEL_USAGE_LOCK = threading.Lock()  # WebUI 출력을 읽는 스레드가 복사를 기다리지 않도록 따로 잠금
+MODEL_CACHE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-cache')
+MODEL_VIEW_PENDING: Dict[str, Path] = {}  # WebUI 가 링크 디렉터리에 저장해 구글 드라이브로 옮기는 중인 파일
+
+# WebUI 가 모델을 불러올 때 출력하는 메세지에서 파일 경로 가져오기
+# Loading weights [6ce0161689] from /content/model-view/Stable-diffusion/model.safetensors
+# Loading VAE weights specified in settings: /content/model-view/VAE/model.vae.pt
+MODEL_LOAD_PATTERN = re.compile(r'^Loading (?:VAE )?weights\b.*?(?:from|:) (/.+?)\s*$')
+
+
+def use_model_cache() -> bool:
+    return IN_COLAB and OPTIONS['USE_GOOGLE_DRIVE'] and OPTIONS['MODEL_CACHE_SIZE'] > 0
+
+
+def model_usage_path() -> Path:
+    return model_store_dir().joinpath('usage.json')
+
+
+def load_model_usage() -> Dict[str, dict]:
+    """
+    모델 파일마다 불러온 횟수와 마지막으로 불러온 시간을 가져옵니다
+
+        { 'Stable-diffusion/model.safetensors': { 'uses': 3, 'last_used': 0.0 } }
+    """
+    try:
+        with model_usage_path().open('r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def model_cache_score(usage: Optional[dict], now: float) -> float:
+    """
+    오래 전에 사용한 횟수일수록 적게 반영한 점수를 반환합니다, 점수가 낮은 파일부터 캐시에서 지움
+    """
+    if not usage:
+        return 0.0
+
+    return usage['uses'] * 0.5 ** ((now - usage['last_used']) / MODEL_CACHE_HALF_LIFE)
+
+
+def list_cacheable_files() -> Dict[str, Path]:
+    """
+    캐시할 수 있는 디렉터리 속 구글 드라이브 파일들을 모델 디렉터리 기준 경로를 키로 반환합니다
+
+    체크포인트와 함께 사용하는 설정 파일도 링크해야 하므로 색인에 이름만 기록된 파일도 포함함
+    구글 드라이브 전체를 훑지 않도록 모델 색인을 사용함
+    """
+    root = models_dir()
+    prefixes = tuple(f'{name}/' for name in MODEL_CACHE_DIRS)
+    files = {}
+
+    # 받다 만 파일은 제외하기
+    for key, entry in update_model_index().items():
+        if key.startswith(prefixes) and not entry['partial']:
+            files[key] = root.joinpath(key)
+
+    for rel, entry in load_model_index()['dirs'].items():
+        if rel not in MODEL_CACHE_DIRS and not rel.startswith(prefixes):
+            continue
+
+        for name in entry.get('extras', []):
+            files[f'{rel}/{name}'] = root.joinpath(rel, name)
+
+    return files
+
+
+def list_cached_files() -> Dict[str, int]:
+    files = {}
+
+    for dirpath, _, filenames in os.walk(MODEL_CACHE_DIR):
+        for filename in filenames:
+            # 복사 중인 파일은 제외하기
+            if filename.endswith('.caching'):
+                continue
+
+            path = Path(dirpath, filename)
+            files[str(path.relative_to(MODEL_CACHE_DIR))] = path.stat().st_size
+
+    return files
+
+
+def link_model_view(key: str, source: Path) -> None:
+    """
+    WebUI 가 보는 디렉터리의 링크가 `source` 를 가리키도록 바꿉니다
+    """
+    link = MODEL_VIEW_DIR.joinpath(key)
+    link.parent.mkdir(0o777, True, True)
+
+    if link.is_symlink() and os.readlink(link) == str(source):
+        return
+
+    # 불러오는 중에도 링크가 사라지지 않도록 새 링크를 만든 뒤 바꾸기
+    temp_link = link.with_name(link.name + '.linking')
+    if temp_link.is_symlink():
+        temp_link.unlink()
+
+    temp_link.symlink_to(source)
+    os.replace(temp_link, link)
+
+
+def refresh_model_view() -> None:
+    """
+    구글 드라이브에 있는 파일마다 로컬 사본이 있다면 사본을, 아니라면 원본을 가리키는 링크를 만듭니다
+    """
+    with MODEL_CACHE_LOCK:
+        files = list_cacheable_files()
+        cached = list_cached_files()
+
+        for dirpath, _, filenames in os.walk(MODEL_VIEW_DIR):
+            for filename in filenames:
+                link = Path(dirpath, filename)
+                key = str(link.relative_to(MODEL_VIEW_DIR))
+
+                # 체크포인트 병합 등으로 WebUI 가 직접 저장한 파일은 구글 드라이브로 옮기기
+                if not link.is_symlink():
+                    adopt_model_view_file(key)
+                    continue
+
+                # 구글 드라이브에서 사라진 파일의 링크와 사본 지우기
+                if key not in files and key not in MODEL_VIEW_PENDING:
+                    link.unlink()
+                    delete(MODEL_CACHE_DIR.joinpath(key))
+
+        for key, path in files.items():
+            link = MODEL_VIEW_DIR.joinpath(key)
+
+            # 옮기지 못한 같은 이름의 파일은 덮어쓰지 않기
+            if link.exists() and not link.is_symlink():
+                continue
+
+            link_model_view(key, MODEL_CACHE_DIR.joinpath(key) if key in cached else path)
+
+
+def adopt_model_view_file(key: str) -> None:
+    """
+    링크 디렉터리에 저장된 일반 파일을 구글 드라이브로 옮기고 그 자리를 링크로 바꿉니다
+
+    옮기는 동안에는 로컬 디스크로 옮긴 파일을 가리키는 링크를 둠
+    """
+    path = MODEL_VIEW_DIR.joinpath(key)
+    target = models_dir().joinpath(key)
+
+    # 아직 쓰는 중일 수도 있는 파일은 다음 주기로 미루기
+    if time.time() - path.stat().st_mtime < MODEL_VIEW_ADOPT_DELAY:
+        return
+
+    # 구글 드라이브에 같은 이름의 파일이 있다면 덮어쓰지 않고 그대로 두기
+    staged = staging_path(target)
+    if not staged:
+        log(f'구글 드라이브에 같은 이름의 파일이 있어 옮기지 않았습니다: {path}', print_to_widget=False)
+        return
+
+    staged.parent.mkdir(0o777, True, True)
+    shutil.move(str(path), staged)
+    link_model_view(key, staged)
+    MODEL_VIEW_PENDING[key] = staged
+
+    def done(future: Future):
+        # 실패했다면 로컬 디스크의 파일을 계속 보여주기
+        if future.exception():
+            return
+
+        with MODEL_CACHE_LOCK:
+            del MODEL_VIEW_PENDING[key]
+            link_model_view(key, target)
+
+    upload(staged, target).add_done_callback(done)
+
+
+def copy_parallel(source: Path, target: Path, connections=4, chunk_size=64 * 1024 * 1024) -> None:
+    """
+    구글 드라이브 FUSE 는 요청 하나의 속도가 느리므로 파일을 여러 구간으로 나눠 동시에 복사합니다
+    """
+    size = source.stat().st_size
+    temp_path = target.with_name(target.name + '.caching')
+    temp_path.parent.mkdir(0o777, True, True)
+
+    with temp_path.open('wb') as file:
+        file.truncate(size)
+
+    src = os.open(source, os.O_RDONLY)
+    dst = os.open(temp_path, os.O_WRONLY)
+
+    def copy_chunk(offset: int):
+        end = min(offset + chunk_size, size)
+
+        while offset < end:
+            data = os.pread(src, min(16 * 1024 * 1024, end - offset), offset)
+            if not data:
+                raise IOError(f'{source} 파일을 끝까지 읽지 못했습니다')
+
+            os.pwrite(dst, data, offset)
+            offset += len(data)
+
+    try:
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            # 하나라도 실패하면 오류 다시 던지기
+            for _ in pool.map(copy_chunk, range(0, size, chunk_size)):
+                pass
+    except:
+        os.close(dst)
+        temp_path.unlink()
+        raise
+    else:
+        os.close(dst)
+    finally:
+        os.close(src)
+
+    os.replace(temp_path, target)
+
+
+def evict_cached_models(needed: int, keep: str) -> bool:
+    """
+    `needed` 바이트를 넣을 수 있을 때까지 점수가 낮은 사본부터 지우고 공간을 확보했는지 반환합니다
+
+    `keep` 보다 점수가 높은 사본은 지우지 않음
+    """
+    budget = OPTIONS['MODEL_CACHE_SIZE'] * 1024 ** 3
+    cached = list_cached_files()
+    usage = load_model_usage()
+    now = time.time()
+
+    keep_score = model_cache_score(usage.get(keep), now)
+    candidates = sorted(cached, key=lambda key: model_cache_score(usage.get(key), now))
+
+    # 캐시 전체보다 큰 파일은 다른 사본을 지워도 넣을 수 없음
+    if needed > budget:
+        return False
+
+    total = sum(cached.values())
+    for key in candidates:
+        if total + needed <= budget:
+            break
+
+        if model_cache_score(usage.get(key), now) > keep_score:
+            return False
+
+        # 링크를 먼저 원본으로 돌려놓은 뒤 사본 지우기, 이미 열린 파일은 닫힐 때까지 읽을 수 있음
+        link_model_view(key, models_dir().joinpath(key))
+        MODEL_CACHE_DIR.joinpath(key).unlink()
+        total -= cached[key]
+
+        log(f'{key} 파일을 모델 캐시에서 지웠습니다', print_to_widget=False)
+
+    return total + needed <= budget
+
+
+def cache_model(key: str) -> None:
+    """
+    구글 드라이브의 모델 파일을 로컬 디스크에 복사하고 링크를 사본으로 바꿉니다
+    """
+    source = models_dir().joinpath(key)
+    target = MODEL_CACHE_DIR.joinpath(key)
+
+    with MODEL_CACHE_LOCK:
+        if target.exists() or not source.is_file():
+            return
+
+        size = source.stat().st_size
+        MODEL_CACHE_DIR.mkdir(0o777, True, True)
+
+        if shutil.disk_usage(MODEL_CACHE_DIR).free - size < MODEL_CACHE_MIN_FREE:
+            return
+
+        if not evict_cached_models(size, key):
+            return
+
+    log_index = log(f'=> {key} 파일을 모델 캐시에 복사합니다', styles={'color': 'yellow'})
+
+    # 복사는 오래 걸리므로 잠금 없이 진행하기, 복사 작업은 한 번에 하나씩만 실행됨
+    try:
+        with trace('cache_model', 'model_cache', key=key, bytes=size):
+            copy_parallel(source, target)
+    except Exception as e:
+        update_log(log_index, {'color': 'red'})
+        log(f'{key} 파일을 복사하지 못했습니다: {e}', parent_index=log_index)
+        return
+
+    update_log(log_index, {'color': 'green'})
+
+    with MODEL_CACHE_LOCK:
+        link_model_view(key, target)
+
+
+def record_model_use(path: str) -> None:
+    """
+    WebUI 가 불러온 모델의 사용 횟수를 늘리고 캐시에 없다면 백그라운드에서 복사합니다
+    """
+    key = None
+    for root in (MODEL_VIEW_DIR, MODEL_CACHE_DIR, models_dir()):
+        try:
+            key = str(Path(path).relative_to(root))
+            break
+        except ValueError:
+            continue
+
+    if not key or not key.startswith(tuple(f'{name}/' for name in MODEL_CACHE_DIRS)):
+        return
+
+    with MODEL_USAGE_LOCK:
+        usage = load_model_usage()
+        entry = usage.setdefault(key, {'uses': 0, 'last_used': 0.0})
+        entry['uses'] += 1
+        entry['last_used'] = time.time()
+
+        path = model_usage_path()
+        path.parent.mkdir(0o777, True, True)
+        temp_path = path.with_suffix('.tmp')
+        temp_path.write_text(json.dumps(usage, indent=1))
+        os.replace(temp_path, path)
+
+    if use_model_cache():
+        MODEL_CACHE_POOL.submit(cache_model, key)
+
+
+def setup_model_cache() -> None:
+    """
+    WebUI 가 볼 링크 디렉터리를 만들고 점수가 높은 모델부터 백그라운드에서 캐시에 복사합니다
+    """
+    if not use_model_cache():
+        return
+
+    refresh_model_view()
+
+    usage = load_model_usage()
+    now = time.time()
+
+    for key in sorted(usage, key=lambda key: -model_cache_score(usage[key], now)):
+        MODEL_CACHE_POOL.submit(cache_model, key)
+
+    # 구글 드라이브에 새로 받은 파일도 WebUI 에서 보이도록 주기적으로 링크하기
+    def worker():
+        while True:
+            time.sleep(MODEL_CACHE_REFRESH_INTERVAL)
+
+            try:
+                refresh_model_view()
+            except Exception as e:
+                log(f'모델 캐시 링크를 갱신하지 못했습니다: {e}', print_to_widget=False)
+
+    threading.Thread(target=worker, name='model-view', daemon=True).start()
+
+
+# ==============================
+# 체크포인트 미리 읽기
+# ==============================
+# WebUI 가 패키지를 설치하는 동안 디스크가 놀고 있으므로 처음 불러올 체크포인트를 페이지 캐시에 미리 읽어둠
+PREWARM_RATE = 64 * 1024 * 1024  # 설치 작업이 느려지지 않도록 제한할 초당 읽기 크기
+PREWARM_CHUNK_SIZE = 8 * 1024 * 1024
+PREWARM_STATE: dict = {}  # 미리 읽는 파일의 실제 경로(path), 크기(size), 읽은 크기(done)
+PREWARM_UNTHROTTLE = threading.Event()  # WebUI 가 불러오기 시작하면 속도 제한 풀기
+
+
+def find_default_checkpoint() -> Optional[Path]:
+    """
+    WebUI 가 처음 불러올 체크포인트를 찾습니다
+
+    설정 파일의 `sd_model_checkpoint` 값을 따르고 없다면 WebUI 처럼 이름 순으로 첫 번째 파일을 사용함
+    """
+    checkpoints = sorted(
+        (
+            key for key, entry in update_model_index().items()
+            if key.startswith('Stable-diffusion/')
+            and key.endswith(('.ckpt', '.safetensors'))
+            and not entry['partial']
+        ),
+        key=str.lower)
+
+    if not checkpoints:
+        return None
+
+    data_dir = LOCAL_DATA_DIR if use_local_data_dir() else Path(WORKSPACE).resolve()
+
+    try:
+        config = json.loads(data_dir.joinpath('config.json').read_text())
+    except (OSError, ValueError):
+        config = {}
+
+    # 설정 값은 `파일 이름 [해시]` 형식임
+    name = re.sub(r'\s*\[[0-9a-f]+\]$', '', config.get('sd_model_checkpoint') or '')
+
+    selected = checkpoints[0]
+    for key in checkpoints:
+        relative = key[len('Stable-diffusion/'):]
+        if name and name in (relative, Path(relative).name):
+            selected = key
+            break
+
+    # 모델 캐시에 사본이 있다면 WebUI 도 사본을 읽음
+    cached = MODEL_CACHE_DIR.joinpath(selected)
+    return cached if cached.exists() else models_dir().joinpath(selected)
+
+
+def prewarm_file(path: Path) -> None:
+    """
+    파일을 순차적으로 읽어 페이지 캐시에 올려둡니다, 읽은 내용은 버림
+    """
+    fd = os.open(path, os.O_RDONLY)
+    offset = 0
+    started_at = time.monotonic()
+
+    try:
+        with trace('prewarm', 'model', path=str(path)) as span:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+            buffer = bytearray(PREWARM_CHUNK_SIZE)
+
+            while True:
+                # 다음 구간도 커널이 미리 읽도록 알려주기
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(fd, offset, PREWARM_CHUNK_SIZE * 2, os.POSIX_FADV_WILLNEED)
+
+                read = os.preadv(fd, [buffer], offset)
+                if not read:
+                    break
+
+                offset += read
+                PREWARM_STATE['done'] = offset
+
+                # 제한 속도보다 빠르게 읽었다면 기다리기
+                if not PREWARM_UNTHROTTLE.is_set():
+                    ahead = offset / PREWARM_RATE - (time.monotonic() - started_at)
+                    if ahead > 0:
+                        PREWARM_UNTHROTTLE.wait(ahead)
+
+            span['bytes'] = offset
+    finally:
+        os.close(fd)
+
+    log(
+        f'{path.name} 파일을 페이지 캐시에 미리 읽었습니다 '
+        f'({offset / 1024 ** 3:.1f}GB, {time.monotonic() - started_at:.0f}초)',
+        print_to_widget=False)
+
+
+def prewarm_checkpoint() -> None:
+    """
+    처음 불러올 체크포인트를 백그라운드 스레드에서 미리 읽기 시작합니다
+    """
+    path = find_default_checkpoint()
+    if not path:
+        return
+
+    PREWARM_STATE.update(
+        path=os.path.realpath(path),
+        size=path.stat().st_size,
+        done=0)
+
+    def worker():
+        try:
+            prewarm_file(path)
+        except OSError as e:
+            log(f'{path.name} 파일을 미리 읽지 못했습니다: {e}', print_to_widget=False)
+
+    threading.Thread(target=worker, name='prewarm', daemon=True).start()
+
+
+def report_prewarm(path: str) -> None:
+    """
+    WebUI 가 처음으로 체크포인트를 불러올 때 미리 읽어둔 비율을 기록합니다
+    """
+    if not PREWARM_STATE or PREWARM_STATE.get('reported'):
+        return
+
+    PREWARM_STATE['reported'] = True
+    PREWARM_UNTHROTTLE.set()
+
+    if os.path.realpath(path) != PREWARM_STATE['path']:
+        log(f'미리 읽은 파일과 다른 체크포인트를 불러옵니다: {Path(path).name}', print_to_widget=False)
+        return
+
+    done, size = PREWARM_STATE['done'], PREWARM_STATE['size']
+    log(f'{Path(path).name} 파일의 {done / max(size, 1):.0%} ({done / 1024 ** 3:.1f}/{size / 1024 ** 3:.1f}GB) 를 미리 읽어둔 상태로 불러옵니다')
+
+
+# ==============================
+# WebUI 스냅샷
+# ==============================
+SNAPSHOT_PATH: Optional[Path] = None
+SNAPSHOT_BASELINE: Optional[Dict[str, float]] = None
+PYTHON_INFO: Optional[Tuple[str, Path]] = None
+
+
+def python_info() -> Tuple[str, Path]:
+    """
+    WebUI 를 실행할 Python 의 버전과 패키지가 설치되는 site-packages 경로를 반환합니다
+    """
+    global PYTHON_INFO
+
+    if not PYTHON_INFO:
+        output = subprocess.check_output(
+            [
+                OPTIONS['PYTHON_EXECUTABLE'] or 'python',
+                '-c', 'import site, sys; print(*sys.version_info[:2], site.getsitepackages()[0])'
+            ],
+            text=True)
+
+        major, minor, site_packages = output.strip().split(' ', 2)
+        PYTHON_INFO = (f'{major}.{minor}', Path(site_packages))
+
+    return PYTHON_INFO
+
+
+def snapshot_path() -> Optional[Path]:
+    """
+    레포지토리 커밋과 Python 버전으로 스냅샷 파일 경로를 만듭니다
+
+    커밋이 지정되지 않았다면 원격 레포지토리의 최신 커밋을 사용하고 가져올 수 없다면 None 을 반환함
+    """
+    global SNAPSHOT_PATH
+
+    if SNAPSHOT_PATH:
+        return SNAPSHOT_PATH
+
+    commit = OPTIONS['REPO_COMMIT']
+    if not commit:
+        try:
+            output = subprocess.check_output(
+                ['git', 'ls-remote', OPTIONS['REPO_URL'], 'HEAD'],
+                text=True,
+                timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+        if not output:
+            return None
+
+        commit = output.split()[0]
+
+    version, _ = python_info()
+
+    # zstd 가 없다면 gzip 으로 압축하기
+    suffix = '.tar.zst' if find_executable('zstd') else '.tar.gz'
+
+    SNAPSHOT_PATH = Path(WORKSPACE, 'cache', f'webui-{commit[:12]}-py{version}{suffix}').resolve()
+    return SNAPSHOT_PATH
+
+
+def snapshot_compress_args(path: Path) -> List[str]:
+    if path.name.endswith('.zst'):
+        return ['--use-compress-program', 'zstd -T0']
+
+    return ['--gzip']
+
+
+def list_site_packages() -> Dict[str, float]:
+    _, site_packages = python_info()
+
+    return {
+        entry.name: entry.stat(follow_symlinks=False).st_mtime
+        for entry in os.scandir(site_packages)
+    }
+
+
+def record_snapshot_baseline() -> None:
+    """
+    스냅샷이 없다면 WebUI 가 패키지를 설치하기 전의 site-packages 상태를 기록합니다
+    """
+    global SNAPSHOT_BASELINE
+
+    path = snapshot_path()
+    if not path or path.exists():
+        return
+
+    SNAPSHOT_BASELINE = list_site_packages()
+
+
+def create_snapshot() -> None:
+    """
+    레포지토리와 WebUI 가 설치하거나 바꾼 패키지만 하나의 압축 파일로 묶습니다
+    """
+    path = snapshot_path()
+    if not path or path.exists() or SNAPSHOT_BASELINE is None:
+        return
+
+    repo_dir = Path('repository').resolve()
+    _, site_packages = python_info()
+
+    packages = list_site_packages()
+    changed = [
+        name for name, mtime in packages.items()
+        if SNAPSHOT_BASELINE.get(name) != mtime
+    ]
+
+    # 새 버전으로 바뀌면서 지워진 패키지는 복원할 때도 지워야 함
+    repo_dir.joinpath('.git', 'easy-sd-snapshot.json').write_text(json.dumps({
+        'site_packages': str(site_packages),
+        'removed': [name for name in SNAPSHOT_BASELINE if name not in packages],
+    }))
+
+    path.parent.mkdir(0o777, True, True)
+    temp_path = path.with_name(path.name + '.tmp')
+
+    try:
+        with trace('snapshot', 'webui', packages=len(changed)):
+            execute(
+                [
+                    'tar',
+                    '-C', '/',
+                    *snapshot_compress_args(path),
+                    '-cf', str(temp_path),
+                    str(repo_dir.relative_to('/')),
+                    *(str(site_packages.joinpath(name).relative_to('/')) for name in changed)
+                ],
+                summary=f'레포지토리와 {len(changed)}개의 패키지로 WebUI 스냅샷을 만듭니다',
+                capture=False)
+
+        os.replace(temp_path, path)
+    except subprocess.CalledProcessError:
+        temp_path.unlink(missing_ok=True)
+        return
+
+    # 커밋마다 새 스냅샷이 만들어지므로 같은 Python 버전의 이전 스냅샷 지우기
+    version, _ = python_info()
+    for old_path in path.parent.glob(f'webui-*-py{version}.tar.*'):
+        if old_path != path and not old_path.name.endswith('.tmp'):
+            log(f'이전 WebUI 스냅샷을 지웁니다: {old_path.name}')
+            old_path.unlink(missing_ok=True)
+
+
+def restore_snapshot() -> bool:
+    """
+    스냅샷이 있다면 레포지토리와 패키지를 한 번에 풀어내고 성공 여부를 반환합니다
+    """
+    path = snapshot_path()
+    if not path or not path.exists():
+        return False
+
+    repo_dir = Path('repository')
+
+    try:
+        with trace('restore_snapshot', 'webui', bytes=path.stat().st_size):
+            execute(
+                ['tar', '-C', '/', *snapshot_compress_args(path), '-xf', str(path)],
+                summary='WebUI 스냅샷을 복원합니다',
+                capture=False)
+    except subprocess.CalledProcessError:
+        log('스냅샷이 잘못됐습니다, 파일을 제거합니다', styles={'color': 'red'})
+        path.unlink()
+        shutil.rmtree(repo_dir, ignore_errors=True)
+        return False
+
+    manifest = json.loads(repo_dir.joinpath('.git', 'easy-sd-snapshot.json').read_text())
+    for name in manifest['removed']:
+        delete(Path(manifest['site_packages'], name))
+
+    return True
+
+
+# ==============================
+# 파일 다운로드
+# ==============================
+def fetch(url: str, target: os.PathLike) -> str:
+    """
+    requests 로 파일을 받으면서 해시 값을 계산합니다, 받다 만 파일이 있다면 Range 요청으로 이어받음
+
+    받은 파일의 sha256 해시 값을 반환함
+    """
+    import hashlib
+
+    path = Path(target)
+    sha256 = hashlib.sha256()
+    offset = path.stat().st_size if path.exists() else 0
+
+    # 이미 받은 부분은 로컬 디스크에 있으므로 먼저 해시에 반영하기
+    if offset:
+        with path.open('rb') as file:
+            while chunk := file.read(16 * 1024 * 1024):
+                sha256.update(chunk)
+
+    # 이어받을 위치가 압축 전 바이트 기준이 되도록 압축 전송을 사용하지 않음
+    headers = {'Accept-Encoding': 'identity'}
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+
+    with requests.get(url, stream=True, headers=headers) as res:
+        # 이미 모두 받은 파일
+        if offset and res.status_code == 416:
+            return sha256.hexdigest()
+
+        res.raise_for_status()
+
+        # 서버가 Range 요청을 지원하지 않는다면 처음부터 다시 받기
+        if offset and res.status_code != 206:
+            offset = 0
+            sha256 = hashlib.sha256()
+
+        length = res.headers.get('Content-Length')
+
+        with path.open('ab' if offset else 'wb') as file:
+            for chunk in res.iter_content(chunk_size=16 * 1024 * 1024):
+                file.write(chunk)
+                sha256.update(chunk)
+
+    if length is not None and path.stat().st_size != offset + int(length):
+        raise IOError(
+            f'{path.name} 파일을 모두 받지 못했습니다 ({path.stat().st_size} / {offset + int(length)} 바이트)')
+
+    return sha256.hexdigest()
+
+
+def fetch_ranged(
+    url: str,
+    target: os.PathLike,
+    connections=8,
+    min_segment_size=8 * 1024 * 1024,
+    retries=5,
+    log_index: Optional[int] = None,
+    span: Optional[dict] = None
+) -> str:
+    """
+    aria2 없이 여러 개의 Range 요청으로 파일을 동시에 받습니다
+
+    미리 크기를 할당한 파일에 구간별로 받은 내용을 기록하고 `<파일>.parts` 에 진행 상태를 저장하므로
+    중간에 끊겨도 이어받을 수 있음, 서버가 Range 요청을 지원하지 않는다면 `fetch()` 로 받음
+
+    받은 파일의 sha256 해시 값을 반환함
+    """
+    import hashlib
+
+    path = Path(target)
+    state_path = path.with_name(path.name + '.parts')
+
+    headers = {'Accept-Encoding': 'identity'}
+
+    with requests.Session() as session:
+        res = session.head(url, allow_redirects=True, headers=headers, timeout=30)
+        size = int(res.headers.get('Content-Length') or 0)
+
+        if not res.ok or res.headers.get('Accept-Ranges') != 'bytes' or size < min_segment_size:
+            return fetch(url, target)
+
+    # 연결마다 여러 구간을 받을 수 있도록 나누기
+    segment_size = max(min_segment_size, -(-size // (connections * 4)))
+    segments = [
+        (start, min(start + segment_size, size) - 1)
+        for start in range(0, size, segment_size)
+    ]
+
+    # 이전에 받다 만 상태 불러오기
+    state = {}
+    if path.exists() and state_path.exists():
+        try:
+            state = json.loads(state_path.read_text())
+        except ValueError:
+            pass
+
+    # 서명된 주소는 세션마다 바뀔 수 있으므로 크기와 구간 크기만 비교하기
+    if state.get('size') != size or state.get('segment_size') != segment_size:
+        state = {
+            'url': url,
+            'size': size,
+            'segment_size': segment_size,
+            'written': [0] * len(segments)
+        }
+
+        # 파일 크기 미리 할당하기
+        with path.open('wb') as file:
+            file.truncate(size)
+
+    lock = threading.Lock()
+    stop = threading.Event()
+    sessions = threading.local()
+    downloaded = 0
+
+    # 받는 동안 앞에서부터 이어서 받아진 부분까지 해시 계산하기
+    # 받은 내용이 페이지 캐시에 남아있을 때 읽으므로 다 받은 뒤 파일 전체를 다시 읽지 않아도 됨
+    sha256 = hashlib.sha256()
+    hashed = 0
+
+    def update_hash(rfd: int):
+        nonlocal hashed
+
+        with lock:
+            end = size
+            for index, (start, stop_at) in enumerate(segments):
+                if start + state['written'][index] <= stop_at:
+                    end = start + state['written'][index]
+                    break
+
+        while hashed < end:
+            data = os.pread(rfd, min(16 * 1024 * 1024, end - hashed), hashed)
+            if not data:
+                raise IOError(f'{path.name} 파일을 끝까지 읽지 못했습니다')
+
+            sha256.update(data)
+            hashed += len(data)
+
+    def save_state():
+        temp_path = state_path.with_suffix('.tmp')
+        temp_path.write_text(json.dumps(state))
+        os.replace(temp_path, state_path)
+
+    def worker(fd: int, index: int):
+        nonlocal downloaded
+
+        # 스레드마다 세션을 만들어 연결을 재사용하기
+        if not hasattr(sessions, 'session'):
+            sessions.session = requests.Session()
+        session: requests.Session = sessions.session
+
+        start, end = segments[index]
+
+        for attempt in range(retries + 1):
+            offset = start + state['written'][index]
+            if offset > end:
+                return
+
+            try:
+                with session.get(
+                    url,
+                    headers={**headers, 'Range': f'bytes={offset}-{end}'},
+                    stream=True,
+                    timeout=30
+                ) as res:
+                    if res.status_code != 206:
+                        raise IOError(f'Range 요청에 {res.status_code} 응답을 받았습니다')
+
+                    for chunk in res.iter_content(chunk_size=1024 * 1024):
+                        if stop.is_set():
+                            return
+
+                        os.pwrite(fd, chunk, offset)
+                        offset += len(chunk)
+
+                        with lock:
+                            state['written'][index] = offset - start
+                            downloaded += len(chunk)
+
+                if offset <= end:
+                    raise IOError('응답이 중간에 끊겼습니다')
+
+                return
+
+            except (requests.RequestException, IOError):
+                if attempt >= retries or stop.is_set():
+                    raise
+
+                # 지수적으로 늘어나는 간격을 두고 다시 시도하기
+                time.sleep(min(30, 0.5 * 2 ** attempt))
+
+    fd = os.open(path, os.O_WRONLY)
+    rfd = os.open(path, os.O_RDONLY)
+    started_at = time.monotonic()
+
+    try:
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            futures = [
+                pool.submit(worker, fd, index)
+                for index, (start, end) in enumerate(segments)
+                if start + state['written'][index] <= end
+            ]
+
+            while True:
+                done, not_done = wait(futures, timeout=5, return_when=FIRST_EXCEPTION)
+
+                with lock:
+                    save_state()
+                    written = sum(state['written'])
+
+                update_hash(rfd)
+
+                if log_index:
+                    speed = downloaded / max(time.monotonic() - started_at, 1e-3)
+                    log(
+                        f'[{written / 1024 ** 2:.0f}/{size / 1024 ** 2:.0f}MB '
+                        f'({written / size:.0%}) {speed / 1024 ** 2:.1f}MB/s]',
+                        parent_index=log_index)
+
+                # 한 구간이라도 실패했다면 나머지 구간도 멈추기
+                if any(future.exception() for future in done):
+                    stop.set()
+                    wait(not_done)
+                    for future in done:
+                        if future.exception():
+                            raise future.exception()  # type: ignore
+
+                if not not_done:
+                    break
+
+        update_hash(rfd)
+    finally:
+        os.close(fd)
+        os.close(rfd)
+
+        # 실패했을 때도 이어받을 수 있도록 마지막 상태 저장하기
+        with lock:
+            save_state()
+
+        if span is not None:
+            span['bytes'] = downloaded
+
+    state_path.unlink()
+    return sha256.hexdigest()
+
+
+def download(
+    url: str,
+    target: Optional[str] = None,
+    ignore_aria2=False,
+    sha256: Optional[str] = None,
+    size: Optional[int] = None,
+    **kwargs
+):
+    """
+    파일을 받습니다
+
+    `sha256` 이나 `size` 를 지정하면 받은 파일이 일치하는지 확인하고 일치하지 않으면 파일을 지운 뒤 오류를 던짐
+    """
+    if not target:
+        # TODO: 경로 중 params 제거하기
+        target = url.split('/')[-1]
+
+    if sha256:
+        sha256 = sha256.lower()
+
+    # 파일을 받을 디렉터리 만들기
+    Path(target).parent.mkdir(0o777, True, True)
+
+    # 해시 값이 같은 파일이 이미 존재한다면 받지 않고 연결하기
+    if sha256:
+        source = find_model(sha256)
+        if source:
+            if source.resolve() != Path(target).resolve():
+                method = link_model(source, target)
+                log(f'{Path(target).name} 파일과 같은 파일이 이미 존재합니다 ({method}): {source}')
+            return
+
+    # 구글 드라이브에 저장될 파일이라면 로컬 디스크에 받은 뒤 옮기기
+    destination = target
+    staged = staging_path(destination)
+    if staged:
+        staged.parent.mkdir(0o777, True, True)
+        target = str(staged)
+
+        # 이전에 옮기지 못한 파일이 남아있다면 다시 받지 않고 옮기기만 하기
+        if staged in UPLOAD_FAILED and staged.exists():
+            UPLOAD_FAILED.remove(staged)
+            upload(staged, destination, sha256)
+            return
+
+    # 이어받기로 이미 받아둔 크기는 전송량에서 제외하기
+    resumed = Path(target).stat().st_size if Path(target).exists() else 0
+
+    # 받는 도중에 확인한 해시 값
+    verified: Optional[str] = None
+
+    with trace('download', 'download', url=url, target=str(target)) as span:
+        # aria2 가 설치돼있다면 사용하고 없다면 내장된 다운로더 사용하기
+        # apt 로 aria2 를 설치하는 건 느리고 오프라인에선 실패하므로 설치하지 않음
+        if not ignore_aria2 and find_executable('aria2c'):
+            p = Path(target)
+            execute(
+                [
+                    'aria2c',
+                    '--continue',
+                    '--always-resume',
+                    '--summary-interval', '10',
+                    '--disk-cache', '64M',
+                    '--min-split-size', '8M',
+                    '--max-concurrent-downloads', '8',
+                    '--max-connection-per-server', '8',
+                    '--max-overall-download-limit', '0',
+                    '--max-download-limit', '0',
+                    '--split', '8',
                     '--dir', str(p.parent),
                     '--out', p.name,
+                    # 해시 값이 일치하지 않으면 aria2 가 오류 코드를 반환함
+                    *(['--checksum', f'sha-256={sha256}'] if sha256 else []),
                     url
                 ],
                 **kwargs)
 
-    elif find_executable('curl'):
-        execute(
-            [
-                'curl',
-                '--location',
-                '--output', target,
-                url
-            ],
-            **kwargs)
+            verified = sha256
 
-    else:
-        if 'summary' in kwargs.keys():
-            log(kwargs.pop('summary'), **kwargs)
+        else:
+            summary = kwargs.get('summary')
+            log_index = log(
+                f'=> {summary}\n   {url}' if summary else f'=> {url}',
+                styles={'color': 'yellow'},
+                max_childs=1)
+
+            try:
+                verified = fetch_ranged(url, target, log_index=log_index, span=span)
+            except:
+                if log_index:
+                    update_log(log_index, {'color': 'red'}, max_childs=0)
+                raise
+
+            if log_index:
+                update_log(log_index, {'color': 'green'}, max_childs=None)
+
+        if Path(target).exists():
+            span.setdefault('bytes', Path(target).stat().st_size - resumed)
+
+        # 받은 파일이 올바른지 확인하기
+        if size is not None and Path(target).stat().st_size != size:
+            actual_size = Path(target).stat().st_size
+            delete(target)
+            raise IOError(f'{Path(target).name} 파일의 크기가 올바르지 않습니다 ({actual_size} != {size})')
 
-        with requests.get(url, stream=True) as res:
-            res.raise_for_status()
+        if sha256:
+            actual_sha256 = verified or hash_file(target)
+            span['sha256'] = actual_sha256
 
-            with open(target, 'wb') as file:
-                # 받아온 파일 디코딩하기
-                # https://github.com/psf/requests/issues/2155#issuecomment-50771010
-                import functools
-                res.raw.read = functools.partial(
-                    res.raw.read,
-                    decode_content=True)
+            if actual_sha256 != sha256:
+                delete(target)
+                raise IOError(f'{Path(target).name} 파일의 해시 값이 올바르지 않습니다 ({actual_sha256} != {sha256})')
 
-                # TODO: 파일 길이가 적합한지?
-                shutil.copyfileobj(res.raw, file, length=16*1024*1024)
+    # 다음 파일을 받는 동안 구글 드라이브로 옮기기
+    # 해시 값을 아는 파일은 다음에 같은 파일을 받을 때 바로 연결할 수 있도록 색인에 추가함
+    if staged:
+        upload(staged, destination, sha256)
+    elif sha256:
+        record_model(target, sha256)
 
 
 def has_checkpoint() -> bool:
-    workspace = Path(WORKSPACE)
-    for p in workspace.joinpath('models', 'Stable-diffusion').glob('**/*'):
-        if p.suffix != '.ckpt' and p.suffix != '.safetensors':
+    for key, entry in update_model_index().items():
+        if not key.startswith('Stable-diffusion/'):
+            continue
+
+        if not key.endswith(('.ckpt', '.safetensors')):
             continue
 
         # aria2 로 받다만 파일이면 무시하기
-        if p.with_suffix(p.suffix + '.aria2c').exists():
+        if entry['partial']:
             continue
 
         return True
@@ -713,6 +3059,15 @@ def has_checkpoint() -> bool:
 
 
 def parse_webui_output(line: str) -> None:
+    # 불러온 모델의 사용 횟수 기록하기
+    match = MODEL_LOAD_PATTERN.match(line)
+    if match:
+        if not line.startswith('Loading VAE'):
+            report_prewarm(match[1])
+
+        record_model_use(match[1])
+        return
+
     # 첫 시작에 한해서 웹 서버 열렸을 때 다이어로그 표시하기
     if line.startswith('Running on local URL:'):
         log(
@@ -722,38 +3077,108 @@ def parse_webui_output(line: str) -> None:
             ]),
             LOG_WIDGET_STYLES['dialog_success']
         )
+
+        # 첫 실행에 성공했다면 설치가 끝난 상태를 스냅샷으로 남기기
+        if SNAPSHOT_BASELINE is not None:
+            threading.Thread(target=create_snapshot, daemon=True).start()
+
         return
 
 
+def git_rev_parse(repo_dir: os.PathLike, rev: str) -> Optional[str]:
+    """
+    리비전의 전체 커밋 해시를 반환합니다, 레포지토리에 없다면 None 을 반환함
+    """
+    p = subprocess.run(
+        ['git', 'rev-parse', '--verify', '--quiet', f'{rev}^{{commit}}'],
+        cwd=repo_dir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True)
+
+    return p.stdout.strip() if p.returncode == 0 else None
+
+
+def fetch_webui_mirror() -> Tuple[Path, str]:
+    """
+    작업 디렉터리의 bare 미러에 필요한 커밋 하나만 얕게 받아두고 미러 경로와 전체 커밋 해시를 반환합니다
+
+    고정된 커밋을 이미 받아뒀다면 네트워크를 사용하지 않음
+    """
+    mirror = Path(WORKSPACE, 'cache', 'webui.git').resolve()
+    commit = OPTIONS['REPO_COMMIT'].strip().lower()
+
+    if not mirror.joinpath('HEAD').exists():
+        shutil.rmtree(mirror, ignore_errors=True)
+        execute(['git', 'init', '--quiet', '--bare', str(mirror)])
+
+    full_commit = git_rev_parse(mirror, commit) if commit else None
+
+    if not full_commit:
+        if commit and len(commit) < 40:
+            # 짧은 해시는 직접 받을 수 없으므로 트리 없이 커밋 기록만 받아서 전체 해시 찾기
+            with tempfile.TemporaryDirectory() as temp_dir:
+                execute(['git', 'init', '--quiet', '--bare', temp_dir])
+                execute(
+                    ['git', 'fetch', '--quiet', '--no-tags', '--filter=tree:0', OPTIONS['REPO_URL'], 'HEAD'],
+                    summary='짧은 커밋 해시의 전체 해시를 찾습니다',
+                    cwd=temp_dir)
+
+                full_commit = git_rev_parse(temp_dir, commit)
+                if not full_commit:
+                    raise ValueError(f'레포지토리에서 {commit} 커밋을 찾을 수 없습니다')
+
+        execute(
+            [
+                'git', 'fetch', '--quiet', '--no-tags', '--depth', '1',
+                OPTIONS['REPO_URL'],
+                full_commit or 'HEAD'
+            ],
+            summary='WebUI 레포지토리의 커밋을 받아옵니다',
+            cwd=mirror)
+
+        full_commit = full_commit or git_rev_parse(mirror, 'FETCH_HEAD')
+        assert full_commit
+
+        # git gc 로 지워지지 않도록 받은 커밋마다 참조 만들기
+        execute(['git', 'update-ref', f'refs/pinned/{full_commit}', full_commit], cwd=mirror)
+
+    return mirror, full_commit
+
+
 def setup_webui() -> None:
     repo_dir = Path('repository')
-    need_clone = True
 
-    # 이미 디렉터리가 존재한다면 정상적인 레포인지 확인하기
-    if repo_dir.is_dir():
-        try:
+    # 새 런타임이라면 스냅샷으로 레포지토리와 패키지를 한 번에 복원하기
+    if OPTIONS['USE_SNAPSHOT'] and not repo_dir.exists() and restore_snapshot():
+        log('WebUI 스냅샷을 복원했습니다')
+
+    # 고정된 커밋이 이미 체크아웃 돼있다면 네트워크 건너뛰기
+    elif (
+        OPTIONS['REPO_COMMIT']
+        and repo_dir.joinpath('.git').is_dir()
+        and (git_rev_parse(repo_dir, 'HEAD') or '').startswith(OPTIONS['REPO_COMMIT'].strip().lower())
+    ):
+        log(f'{OPTIONS["REPO_COMMIT"]} 커밋이 이미 체크아웃 돼있습니다')
+
+    else:
+        mirror, commit = fetch_webui_mirror()
+
+        # 레포지토리가 잘못됐다면 디렉터리 지우고 새로 만들기
+        if not repo_dir.joinpath('.git').is_dir() or not git_rev_parse(repo_dir, 'HEAD'):
+            shutil.rmtree(repo_dir, ignore_errors=True)
+            execute(['git', 'init', '--quiet', str(repo_dir)])
+            execute(['git', 'remote', 'add', 'origin', OPTIONS['REPO_URL']], cwd=repo_dir)
+        else:
             # 사용자 파일만 남겨두고 레포지토리 초기화하기
             # https://stackoverflow.com/a/12096327
-            execute(
-                'git stash && git pull origin master',
-                cwd=repo_dir
-            )
-        except subprocess.CalledProcessError:
-            log('레포지토리가 잘못됐습니다, 디렉터리를 제거합니다')
-        else:
-            need_clone = False
-
-    # 레포지토리 클론이 필요하다면 기존 디렉터리 지우고 클론하기
-    if need_clone:
-        shutil.rmtree(repo_dir, ignore_errors=True)
-        execute(['git', 'clone', OPTIONS['REPO_URL'], str(repo_dir)])
+            execute(['git', 'stash'], cwd=repo_dir)
 
-    # 특정 커밋이 지정됐다면 체크아웃하기
-    if OPTIONS['REPO_COMMIT']:
+        # 미러에서 필요한 커밋만 얕게 가져와 체크아웃하기
         execute(
-            ['git', 'checkout', OPTIONS['REPO_COMMIT']],
-            cwd=repo_dir
-        )
+            ['git', 'fetch', '--quiet', '--no-tags', '--depth', '1', mirror.as_uri(), f'refs/pinned/{commit}'],
+            cwd=repo_dir)
+        execute(['git', 'checkout', '--quiet', '--force', '--detach', commit], cwd=repo_dir)
 
     if IN_COLAB:
         patch_path = repo_dir.joinpath('scripts', 'patches.py')
@@ -769,22 +3194,37 @@ def start_webui(args: List[str] = OPTIONS['ARGS']) -> None:
     workspace = Path(WORKSPACE).resolve()
     repository = Path('repository').resolve()
 
+    # WebUI 가 모델을 찾을 수 있도록 구글 드라이브로 옮기는 중인 파일 기다리기
+    wait_uploads()
+
+    # 링크 디렉터리는 옮기기가 끝나기 전에 만들어졌으므로 옮긴 파일도 보이도록 다시 링크하기
+    if use_model_cache():
+        refresh_model_view()
+
     # 기본 인자 만들기
     if len(args) < 1:
-        args += ['--data-dir', str(workspace)]
+        args += ['--data-dir', str(LOCAL_DATA_DIR if use_local_data_dir() else workspace)]
 
-        # xformers
-        if OPTIONS['USE_XFORMERS']:
-            try:
-                import torch
-            except ImportError:
-                pass
-            else:
-                if torch.cuda.is_available():
-                    args += [
-                        '--xformers',
-                        '--xformers-flash-attention'
-                    ]
+        # 모델 캐시의 링크 디렉터리에서 모델 불러오기
+        if use_model_cache():
+            args += [
+                '--ckpt-dir', str(MODEL_VIEW_DIR.joinpath('Stable-diffusion')),
+                '--vae-dir', str(MODEL_VIEW_DIR.joinpath('VAE'))
+            ]
+
+        if GPU_INFO:
+            # xformers
+            if OPTIONS['USE_XFORMERS']:
+                args += [
+                    '--xformers',
+                    '--xformers-flash-attention'
+                ]
+
+            # VRAM 이 부족하다면 모델을 나눠서 GPU 에 올리기
+            if GPU_INFO['vram'] < GPU_LOWVRAM_THRESHOLD:
+                args += ['--lowvram']
+            elif GPU_INFO['vram'] < GPU_MEDVRAM_THRESHOLD:
+                args += ['--medvram']
 
         # Gradio 인증 정보
         if OPTIONS['GRADIO_USERNAME'] != '':
@@ -798,9 +3238,15 @@ def start_webui(args: List[str] = OPTIONS['ARGS']) -> None:
     # 추가 인자
     args += OPTIONS['EXTRA_ARGS']
 
+    if OPTIONS['USE_SNAPSHOT']:
+        record_snapshot_baseline()
+
     env = {
         **os.environ,
         'HF_HOME': str(workspace / 'cache' / 'huggingface'),
+        # launch.py 가 설치하는 패키지도 다음 런타임에서 다시 받지 않도록 캐시와 wheelhouse 사용하기
+        'PIP_CACHE_DIR': str(pip_cache_dir()),
+        'PIP_FIND_LINKS': str(wheelhouse_dir()),
     }
 
     # https://github.com/googlecolab/colabtools/issues/3412
@@ -816,6 +3262,8 @@ def start_webui(args: List[str] = OPTIONS['ARGS']) -> None:
                 *args
             ],
             parser=parse_webui_output,
+            # WebUI 는 몇 시간씩 실행되므로 오류 확인에 필요한 마지막 출력만 메모리에 남겨두기
+            capture=64 * 1024,
             cwd=str(repository),
             env=env,
             start_new_session=True,
@@ -826,24 +3274,158 @@ def start_webui(args: List[str] = OPTIONS['ARGS']) -> None:
                 '프로세스가 강제 종료됐습니다, 메모리가 부족해 발생한 문제일 수도 있습니다') from e
 
 
-try:
-    setup_environment()
+def main() -> None:
+    try:
+        setup_environment()
 
-    # 3단 이상(?) 레벨에서 실행하면 nested 된 asyncio 이 문제를 일으킴
-    # 런타임을 종료해도 코랩 페이지에선 런타임이 실행 중(Busy)인 것으로 표시되므로 여기서 실행함
-    if OPTIONS['DISCONNECT_RUNTIME']:
-        hook_runtime_disconnect()
+        # 서로 의존하지 않는 단계들 동시에 실행하기
+        run_stages(boot_stages())
 
-    setup_webui()
-    start_webui()
+        # 3단 이상(?) 레벨에서 실행하면 nested 된 asyncio 이 문제를 일으킴
+        # 런타임을 종료해도 코랩 페이지에선 런타임이 실행 중(Busy)인 것으로 표시되므로 여기서 실행함
+        if OPTIONS['DISCONNECT_RUNTIME']:
+            hook_runtime_disconnect()
 
-# ^c 종료 무시하기
-except KeyboardInterrupt:
-    pass
+        start_webui()
+
+    # ^c 종료 무시하기
+    except KeyboardInterrupt:
+        pass
+
+    except:
+        # 로그 위젯이 없다면 평범하게 오류 처리하기
+        if not LOG_WIDGET:
+            raise
+
+        log_trace()
+
+    finally:
+        # 로컬 디스크에만 있는 데이터를 구글 드라이브에 반영하기
+        stop_local_data_sync()
+
+        # 예약된 로그 렌더링이 남아있다면 마저 반영하기
+        flush_log()
+
+        # 큐에 남은 기록을 파일과 표준 출력에 마저 내보내기
+        drain_log()
+
+
+# ==============================
+# 부팅 단계
+# ==============================
+# 단계 이름: (함수, 먼저 끝나야 하는 단계 이름 목록)
+BOOT_STAGES: Dict[str, Tuple[Callable[[], None], List[str]]] = {
+    'python': (setup_python, []),
+    'gpu': (check_gpu, []),
+    # apt 는 동시에 실행할 수 없으므로 Python 설치가 끝난 뒤에 실행하기
+    'tcmalloc': (setup_tcmalloc, ['python']),
+    'tunnel': (setup_tunnels, []),
+    'models': (reconcile_models, []),
+    'store': (setup_model_store, ['models']),
+    # 스냅샷은 WebUI 를 실행할 Python 이 설치된 뒤에 복원하기
+    'webui': (setup_webui, ['python']),
+    'data': (setup_local_data_dir, []),
+    'model_cache': (setup_model_cache, ['store']),
+    # 설정 파일과 캐시된 사본을 확인한 뒤 미리 읽기 시작하기
+    'prewarm': (prewarm_checkpoint, ['store', 'model_cache', 'data']),
+}
+
+
+def boot_stages() -> Dict[str, Tuple[Callable[[], None], List[str]]]:
+    """
+    override.json 까지 반영된 설정에 따라 부팅 단계 목록을 만듭니다
+    """
+    stages = dict(BOOT_STAGES)
+
+    # 터널 패키지는 스냅샷을 복원할 site-packages 에 설치되므로 복원이 끝난 뒤에 설치하기
+    if OPTIONS['USE_SNAPSHOT']:
+        func, deps = stages['tunnel']
+        stages['tunnel'] = (func, [*deps, 'webui'])
+
+    return stages
+
+
+def run_stages(
+    stages: Dict[str, Tuple[Callable[[], None], List[str]]],
+    max_workers=4
+) -> Dict[str, dict]:
+    """
+    의존 관계에 따라 서로 독립적인 단계들을 동시에 실행하고 단계별 소요 시간을 표로 출력합니다
+
+    실패한 단계에 의존하는 단계는 건너뛰며, 모든 단계가 끝난 뒤 첫 번째 오류를 다시 던짐
+    """
+    for name, (_, deps) in stages.items():
+        for dep in deps:
+            if dep not in stages:
+                raise ValueError(f'{name} 단계가 존재하지 않는 {dep} 단계에 의존합니다')
+
+    started_at = time.monotonic()
+    results: Dict[str, dict] = {}
+    running: Dict[Future, str] = {}
+    pending = dict(stages)
+    error: Optional[BaseException] = None
+
+    def run(name: str, func: Callable[[], None]) -> None:
+        results[name]['start'] = time.monotonic() - started_at
+        try:
+            with trace(name, 'stage'):
+                func()
+        finally:
+            results[name]['end'] = time.monotonic() - started_at
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # 의존하는 단계가 모두 끝난 단계 실행하기
+            for name, (func, deps) in list(pending.items()):
+                statuses = [results.get(dep, {}).get('status') for dep in deps]
+
+                if any(status in ('failed', 'skipped') for status in statuses):
+                    results[name] = {'status': 'skipped'}
+                    del pending[name]
+                    continue
+
+                if all(status == 'done' for status in statuses):
+                    results[name] = {'status': 'running'}
+                    running[pool.submit(run, name, func)] = name
+                    del pending[name]
+
+            if not running:
+                # 건너뛴 단계 때문에 새로 실행할 수 있는 단계가 생겼을 수 있음
+                if pending and not any(
+                    all(dep in results for dep in deps)
+                    for _, deps in pending.values()
+                ):
+                    raise ValueError(f'순환 의존 관계가 존재합니다: {", ".join(pending)}')
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                e = future.exception()
+                results[name]['status'] = 'done' if e is None else 'failed'
+                if e is not None and error is None:
+                    error = e
+
+    # 단계별 소요 시간 표 출력하기
+    rows = [f'{"stage":<10} {"status":<8} {"start":>8} {"elapsed":>8}']
+    for name in stages:
+        result = results[name]
+        if 'start' in result:
+            rows.append(
+                f'{name:<10} {result["status"]:<8} '
+                f'{result["start"]:>7.1f}s {result["end"] - result["start"]:>7.1f}s')
+        else:
+            rows.append(f'{name:<10} {result["status"]:<8} {"-":>8} {"-":>8}')
+    rows.append(f'총 {time.monotonic() - started_at:.1f}s')
+
+    log('\n'.join(rows), styles={'color': 'cyan'})
+
+    if error:
+        raise error
+
+    return results
 
-except:
-    # 로그 위젯이 없다면 평범하게 오류 처리하기
-    if not LOG_WIDGET:
-        raise
 
-    log_trace()
+# 벤치마크 등에서 모듈로 불러올 때는 실행하지 않음 (노트북 셀에선 항상 __main__ 임)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+실행 로그를 `log()` 에 그대로 다시 흘려보내 로그 위젯 렌더링 비용을 측정합니다
+
+    python benchmarks/log_widget.py [로그 파일 경로] [--lines 100000]
+
+로그 파일을 지정하지 않으면 pip install 출력과 비슷한 줄을 만들어 사용합니다
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import time
+from pathlib import Path
+
+from ipywidgets import widgets
+
+LAUNCHER_PATH = Path(__file__).resolve().parents[1] / '1-easy-stable-diffusion.py'
+
+
+def load_launcher():
+    spec = importlib.util.spec_from_file_location('launcher', LAUNCHER_PATH)
+    assert spec and spec.loader
+
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fake_lines(n: int):
+    for i in range(n):
+        yield f'Collecting package-{i % 500}==1.{i % 7}.{i % 13} (from -r requirements.txt (line {i}))\n'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', nargs='?', type=Path)
+    parser.add_argument('--lines', type=int, default=100_000)
+    args = parser.parse_args()
+
+    launcher = load_launcher()
+    launcher.LOG_WIDGET = widgets.VBox()
+
+    if args.path:
+        with args.path.open('r') as file:
+            lines = file.readlines()[:args.lines]
+    else:
+        lines = list(fake_lines(args.lines))
+
+    # 표준 출력은 측정 대상이 아니므로 버리기
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+
+        index = launcher.log('=> replay', max_childs=10)
+        for line in lines:
+            launcher.log(line, newline=False, parent_index=index)
+        launcher.flush_log()
+        launcher.drain_log()
+
+        elapsed = time.perf_counter() - start
+
+    stats = launcher.LOG_WIDGET_STATS
+    print(f'lines:   {len(lines)}')
+    print(f'time:    {elapsed:.3f}s ({len(lines) / elapsed:.0f} lines/s)')
+    print(f'renders: {stats["renders"]}')
+    print(f'bytes:   {stats["bytes"]}')
+
+
+if __name__ == '__main__':
+    main()
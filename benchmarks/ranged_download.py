@@ -0,0 +1,197 @@
+"""
+로컬 HTTP 서버를 띄워 내장 다운로더의 단일 연결(`fetch()`)과 다중 Range 연결(`fetch_ranged()`) 속도를 비교합니다
+
+    python benchmarks/ranged_download.py [--size-mb 64] [--rate-mb 8] [--connections 8] [--drop 0.05]
+    python benchmarks/ranged_download.py --check
+
+`--rate-mb` 는 연결 하나당 전송 속도 제한, `--drop` 은 응답 도중 연결을 끊을 확률이며
+반환한 sha256 해시 값과 받은 파일이 원본과 같은지도 확인함
+
+`--check` 는 구간 도중에 연결을 끊은 뒤 `.parts` 상태로 이어받아 받은 내용과 반환한 해시 값이 맞는지 확인하고
+일치하지 않으면 0 이 아닌 코드로 종료함
+"""
+import argparse
+import hashlib
+import http.server
+import importlib.util
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+LAUNCHER_PATH = Path(__file__).resolve().parents[1] / '1-easy-stable-diffusion.py'
+
+
+def load_launcher():
+    spec = importlib.util.spec_from_file_location('launcher', LAUNCHER_PATH)
+    assert spec and spec.loader
+
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def serve(
+    data: bytes,
+    rate: float,
+    drop: float,
+    drop_after: Optional[int] = None
+) -> http.server.ThreadingHTTPServer:
+    """
+    `drop_after` 를 지정하면 응답마다 그만큼의 바이트만 보내고 연결을 끊음, 보낸 바이트 수는 `server.sent` 에 더함
+    """
+    lock = threading.Lock()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+
+        def do_GET(self):
+            start, end = 0, len(data) - 1
+            match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+
+            if match:
+                start = int(match[1])
+                end = int(match[2]) if match[2] else end
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+            else:
+                self.send_response(200)
+
+            body = memoryview(data)[start:end + 1]
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+
+            # 연결 하나당 전송 속도 제한하기
+            chunk_size = 256 * 1024
+            for offset in range(0, len(body), chunk_size):
+                if random.random() < drop or (drop_after is not None and offset >= drop_after):
+                    self.close_connection = True
+                    return
+
+                chunk = body[offset:offset + chunk_size]
+                self.wfile.write(chunk)
+
+                with lock:
+                    server.sent += len(chunk)  # type: ignore
+
+                time.sleep(chunk_size / rate)
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.sent = 0  # type: ignore
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check(launcher) -> None:
+    """
+    구간 도중에 끊긴 다운로드를 `.parts` 상태로 이어받고 반환한 해시 값이 원본과 같은지 확인합니다
+    """
+    size = 16 * 1024 * 1024
+    segment_size = 4 * 1024 * 1024
+
+    data = os.urandom(size)
+    expected = hashlib.sha256(data).hexdigest()
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = Path(tempdir, 'model.safetensors')
+        state_path = path.with_name(path.name + '.parts')
+
+        # 구간마다 앞의 1.5MB 만 보내고 연결 끊기, 다운로더는 1MB 단위로 기록하므로 구간마다 1MB 가 남음
+        server = serve(data, 256 * 1024 * 1024, 0, drop_after=1536 * 1024)
+        url = f'http://127.0.0.1:{server.server_port}/model.safetensors'
+
+        try:
+            launcher.fetch_ranged(url, path, connections=4, min_segment_size=segment_size, retries=0)
+        except Exception:
+            pass
+        else:
+            raise AssertionError('연결이 끊겼는데 다운로드가 끝났습니다')
+        finally:
+            server.shutdown()
+
+        assert state_path.exists(), '.parts 상태 파일이 남아있지 않습니다'
+
+        segments = json.loads(state_path.read_text())['written']
+        written = sum(segments)
+        assert 0 < written < size, f'저장된 진행 상태가 올바르지 않습니다 ({written} 바이트)'
+        assert any(0 < part < segment_size for part in segments), '구간 도중에 끊긴 상태가 아닙니다'
+
+        # 남은 부분만 이어받기
+        server = serve(data, 256 * 1024 * 1024, 0)
+        url = f'http://127.0.0.1:{server.server_port}/model.safetensors'
+
+        try:
+            digest = launcher.fetch_ranged(url, path, connections=4, min_segment_size=segment_size)
+        finally:
+            server.shutdown()
+
+        assert server.sent == size - written, f'이미 받은 부분을 다시 받았습니다 ({server.sent} != {size - written})'  # type: ignore
+        assert digest == expected, f'반환한 해시 값이 다릅니다 ({digest} != {expected})'
+        assert path.read_bytes() == data, '받은 파일의 내용이 다릅니다'
+        assert not state_path.exists(), '.parts 상태 파일이 지워지지 않았습니다'
+
+    print(f'fetch_ranged resume ok (이미 받은 {written} 바이트부터 이어받음), sha256 ok')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=64)
+    parser.add_argument('--rate-mb', type=float, default=8)
+    parser.add_argument('--connections', type=int, default=8)
+    parser.add_argument('--drop', type=float, default=0.0)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    launcher = load_launcher()
+
+    if args.check:
+        try:
+            check(launcher)
+        except AssertionError as e:
+            print(f'FAILED: {e}')
+            sys.exit(1)
+        return
+
+    data = os.urandom(args.size_mb * 1024 * 1024)
+    expected = hashlib.sha256(data).hexdigest()
+
+    server = serve(data, args.rate_mb * 1024 * 1024, args.drop)
+    url = f'http://127.0.0.1:{server.server_port}/model.safetensors'
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        for name, func in (
+            ('fetch', lambda path: launcher.fetch(url, path)),
+            ('fetch_ranged', lambda path: launcher.fetch_ranged(
+                url, path, connections=args.connections, min_segment_size=1024 * 1024)),
+        ):
+            path = Path(tempdir, name)
+
+            start = time.perf_counter()
+            digest = func(path)
+            elapsed = time.perf_counter() - start
+
+            # 받으면서 계산한 해시 값과 실제 파일 모두 확인하기
+            ok = digest == expected and launcher.hash_file(path) == expected
+            print(f'{name:<14} {elapsed:>7.2f}s {args.size_mb / elapsed:>7.1f}MB/s  sha256 {"ok" if ok else "MISMATCH"}')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
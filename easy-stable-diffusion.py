@@ -1,10 +1,14 @@
+import json
 import os
-import shlex
+import secrets
+import subprocess
+import threading
 import time
+import urllib.request
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from urllib.parse import urlparse, unquote
-from tempfile import TemporaryDirectory
 from typing import Union, List, Dict
 from IPython.display import display
 from ipywidgets import widgets
@@ -23,18 +27,36 @@ DISCONNECT_RUNTIME = True  #@param {type:"boolean"}
 # fmt: on
 
 #界面元素
+search_box = widgets.Text(
+    placeholder='搜索模型 (名称,类型,格式)',
+    layout={"width": "99%"})
+search_results = widgets.Select(rows=10, layout={"width": "99%", "display": "none"})
 dropdowns = widgets.VBox()
 output = widgets.Output()
 download_button = widgets.Button(
-    description='下载',
+    description='添加到下载队列',
     disabled=True,
     layout={"width": "99%"}
 )
 
+#下载队列
+queue_select = widgets.Select(rows=6, layout={"width": "99%"})
+queue_up_button = widgets.Button(description='上移', layout={"width": "33%"})
+queue_down_button = widgets.Button(description='下移', layout={"width": "33%"})
+queue_cancel_button = widgets.Button(description='取消', layout={"width": "33%"})
+
 display(
     widgets.HBox(children=(
         widgets.VBox(
-            children=(dropdowns, download_button),
+            children=(
+                search_box,
+                search_results,
+                dropdowns,
+                download_button,
+                widgets.Label('下载队列'),
+                queue_select,
+                widgets.HBox((queue_up_button, queue_down_button, queue_cancel_button))
+            ),
             layout={"margin-right": "1em"}
         ),
         output
@@ -47,19 +69,265 @@ sd_model_dir = workspace_dir.joinpath('models', 'Stable-diffusion')
 sd_embedding_dir = workspace_dir.joinpath('embeddings')
 vae_dir = workspace_dir.joinpath('models', 'VAE')
 
-#安装谷歌硬盘
-with output:
-    drive.mount('drive')
+#如果驱动器已经安装(例如再次运行此单元),则立即读取已下载的模型文件
+drive_mounted = Path('drive', 'MyDrive').is_dir()
+
+
+def mount_drive() -> None:
+    """
+    第一次开始下载时才安装谷歌硬盘,以便立即显示选择界面
+    """
+    global drive_mounted, model_index
+
+    if drive_mounted:
+        return
+
+    with output:
+        drive.mount('drive')
+
+    drive_mounted = True
+
+    #安装后重新读取已下载的模型文件,并更新已显示的下拉列表中的标记
+    model_index = load_model_index()
+    refresh_dropdowns()
+
+
+def load_model_index() -> set:
+    """
+    读取启动器维护的模型文件索引,返回已下载完成的文件路径集合
+    """
+    try:
+        with workspace_dir.joinpath('models', '.store', 'index.json').open('r') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return set()
+
+    return {
+        str(workspace_dir.joinpath('models', key))
+        for key, entry in index.get('files', {}).items()
+        if not entry.get('partial')
+    }
+
+
+#已下载的模型文件
+model_index = load_model_index() if drive_mounted else set()
+
+#先将文件接收到本地磁盘,然后在后台移动到驱动器
+staging_dir = Path('/content/staging')
+upload_pool = ThreadPoolExecutor(max_workers=2)
+uploads: List[Future] = []
+
+#所有文件共享的最大连接数
+CONNECTION_BUDGET = 16
+
+
+def sync_to_drive(files: List['File']) -> None:
+    """
+    将下载完成的文件一次性移动到驱动器
+    """
+    def run():
+        #rsync 会先写入临时文件再重命名,因此中断时不会留下不完整的文件
+        subprocess.run(
+            [
+                'rsync', '-a', '--remove-source-files',
+                '--files-from=-',
+                f'{staging_dir}/', f'{workspace_dir}/'
+            ],
+            input='\n'.join(str(file.staged.relative_to(staging_dir)) for file in files),
+            text=True,
+            check=True)
+
+        for file in files:
+            model_index.add(str(file.target))
+
+        #移动完成后才算已下载,更新下拉列表中的标记
+        refresh_dropdowns()
+
+        output.append_stdout(f'已将{len(files)}个文件移动到驱动器.\n')
+
+    uploads.append(upload_pool.submit(run))
+
+
+def wait_uploads() -> None:
+    if uploads:
+        output.append_stdout(f'正在等待{len(uploads)}个任务移动到驱动器.\n')
+
+    while uploads:
+        uploads.pop(0).result()
+
 
-sd_model_dir.mkdir(0o777, True, True)
-sd_embedding_dir.mkdir(0o777, True, True)
-vae_dir.mkdir(0o777, True, True)
+aria2_installed = False
+
+
+def install_aria2() -> None:
+    global aria2_installed
+
+    if aria2_installed:
+        return
+
+    subprocess.run('which aria2c || apt install -y aria2', shell=True, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    aria2_installed = True
+
+
+def aria2_rpc(secret: str, method: str, *params):
+    request = urllib.request.Request(
+        'http://127.0.0.1:6800/jsonrpc',
+        data=json.dumps({
+            'jsonrpc': '2.0',
+            'id': 'easy-stable-diffusion',
+            'method': method,
+            'params': [f'token:{secret}', *params]
+        }).encode(),
+        headers={'Content-Type': 'application/json'})
+
+    with urllib.request.urlopen(request, timeout=5) as res:
+        return json.load(res)['result']
+
+
+#取消当前正在下载的任务
+cancel_event = threading.Event()
+
+
+def download_files(files: List['File']) -> None:
+    """
+    在一个aria2会话中同时接收所有文件,并显示每个文件的进度
+    """
+    output.clear_output()
+    install_aria2()
+
+    #为每个文件分配连接数
+    split = max(1, CONNECTION_BUDGET // len(files))
+    secret = secrets.token_hex(16)
+
+    #aria2输入文件,每个文件使用固定的gid以便查询进度
+    lines = []
+    for i, file in enumerate(files):
+        file.staged.parent.mkdir(0o777, True, True)
+        lines += [
+            file.url,
+            f'  gid={i + 1:016x}',
+            f'  dir={file.staged.parent}',
+            f'  out={file.staged.name}',
+            f'  split={split}',
+            f'  max-connection-per-server={split}',
+            #哈希值不匹配时aria2会将下载标记为错误
+            *([f'  checksum=sha-256={file.sha256}'] if file.sha256 else []),
+            *(f'  {arg.lstrip("-")}' for arg in file.extra_args),
+        ]
+
+    staging_dir.mkdir(0o777, True, True)
+    input_path = staging_dir.joinpath('aria2.input')
+    input_path.write_text('\n'.join(lines) + '\n')
+
+    process = subprocess.Popen(
+        [
+            'aria2c',
+            '--enable-rpc',
+            '--rpc-listen-port', '6800',
+            '--rpc-secret', secret,
+            '--continue',
+            '--always-resume',
+            '--console-log-level', 'error',
+            '--max-concurrent-downloads', str(len(files)),
+            '--min-split-size', '8M',
+            '--input-file', str(input_path),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL)
+
+    #每个文件的进度条
+    bars = []
+    for file in files:
+        bar = widgets.FloatProgress(
+            min=0, max=1,
+            description=file.target.name[:24],
+            style={'description_width': '14em'},
+            layout={'width': '32em'})
+        label = widgets.Label()
+        bars.append((bar, label))
+
+    #下载在后台线程中运行,因此不使用 `with output:`
+    output.append_stdout('使用aria 2同时接收所有文件.\n')
+    output.append_display_data(widgets.VBox([widgets.HBox(pair) for pair in bars]))
+
+    succeeded = []
+
+    try:
+        pending = set(range(len(files)))
+        while pending and process.poll() is None:
+            time.sleep(1)
+
+            #用户取消了当前任务
+            if cancel_event.is_set():
+                for i in pending:
+                    bars[i][0].bar_style = 'warning'
+                    bars[i][1].value = '已取消'
+                break
+
+            for i in list(pending):
+                try:
+                    status = aria2_rpc(
+                        secret, 'aria2.tellStatus', f'{i + 1:016x}',
+                        ['status', 'completedLength', 'totalLength', 'downloadSpeed', 'errorMessage'])
+                except (OSError, KeyError, ValueError):
+                    #RPC服务器尚未准备好
+                    break
+
+                bar, label = bars[i]
+                total = int(status['totalLength'])
+                done = int(status['completedLength'])
+
+                if total:
+                    bar.value = done / total
+                    label.value = f'{done / 1024 ** 2:.0f}/{total / 1024 ** 2:.0f}MB {int(status["downloadSpeed"]) / 1024 ** 2:.1f}MB/s'
+
+                #文件大小不正确
+                if status['status'] == 'complete' and files[i].size is not None and total != files[i].size:
+                    bar.bar_style = 'danger'
+                    label.value = f'文件大小不正确:{total} != {files[i].size}'
+                    files[i].staged.unlink()
+                    pending.discard(i)
+
+                elif status['status'] == 'complete':
+                    bar.value = 1
+                    bar.bar_style = 'success'
+                    label.value = f'{total / 1024 ** 2:.0f}MB'
+                    succeeded.append(files[i])
+                    pending.discard(i)
+
+                elif status['status'] in ('error', 'removed'):
+                    bar.bar_style = 'danger'
+                    label.value = status.get('errorMessage', '')
+                    pending.discard(i)
+    finally:
+        try:
+            aria2_rpc(secret, 'aria2.shutdown')
+        except (OSError, KeyError, ValueError):
+            process.kill()
+
+        process.wait()
+
+    output.append_stdout(
+        f'已接收{len(succeeded)}/{len(files)}个文件,将在后台移动到驱动器.\n'
+        '根据文件大小,此操作可能需要5分钟或更长时间,请稍候.\n')
+
+    #只同步一次驱动器
+    if succeeded:
+        sync_to_drive(succeeded)
 
 
 class File:
     prefix: Path
 
-    def __init__(self, url: str, path: os.PathLike = None, *extra_args: List[str]) -> None:
+    def __init__(
+        self,
+        url: str,
+        path: os.PathLike = None,
+        *extra_args: List[str],
+        size: int = None,
+        sha256: str = None
+    ) -> None:
         if self.prefix:
             if not path:
                 path = self.prefix
@@ -70,49 +338,32 @@ class File:
         self.path = Path(path)
         self.extra_args = extra_args
 
+        #如果已知,将用于验证下载的文件是否完整
+        self.size = size
+        self.sha256 = sha256.lower() if sha256 else None
+
+    @property
+    def target(self) -> Path:
+        #如果目的地路径不是目录,请按原样使用
+        if self.path != self.prefix and not self.path.is_dir():
+            return self.path
+
+        #否则,从文件远程地址获取文件名
+        return self.path.joinpath(
+            unquote(os.path.basename(urlparse(self.url).path))
+        )
+
+    @property
+    def installed(self) -> bool:
+        return str(self.target) in model_index
+
+    @property
+    def staged(self) -> Path:
+        #在本地磁盘上保持与驱动器相同的目录结构
+        return staging_dir.joinpath(self.target.relative_to(workspace_dir))
+
     def download(self) -> None:
-        output.clear_output()
-
-        with TemporaryDirectory() as tempdir:
-            args = shlex.join((
-                '--continue',
-                '--always-resume',
-                '--summary-interval', '3',
-                '--console-log-level', 'error',
-                '--max-concurrent-downloads', '16',
-                '--max-connection-per-server', '16',
-                '--split', '16',
-                '--dir', tempdir,
-                *self.extra_args,
-                self.url
-            ))
-
-            with output:
-                # 使用aria2获取文件
-                # fmt: off
-                !which aria2c || apt install -y aria2
-                output.clear_output()
-
-                print('使用aria 2接收文件.')
-                !aria2c {args}
-                output.clear_output()
-
-                print('文件已成功接收,请转到驱动器.')
-                print('根据文件大小,此操作可能需要5分钟或更长时间,请稍候.')
-                if DISCONNECT_RUNTIME:
-                    print('任务完成后将自动关闭运行时,您可以继续执行其他任务.')
-
-                #如果目的地路径不是目录,请按原样使用
-                filename = str(self.path) if not self.path.is_dir() else self.path.joinpath(
-                    #否则,从文件远程地址获取文件名
-                    unquote(os.path.basename(urlparse(self.url).path))
-                )
-
-                print(f'路径:{filename}')
-
-                !rsync -aP "{tempdir}/$(ls -AU {tempdir} | head -1)" "{filename}"
-
-                # fmt: on
+        download_files([self])
 
 
 class ModelFile(File):
@@ -127,544 +378,653 @@ class VaeFile(File):
     prefix = vae_dir
 
 
-#型号列表
-CONFIG_V2_V = 'https://raw.githubusercontent.com/Stability-AI/stablediffusion/main/configs/stable-diffusion/v2-inference-v.yaml'
-
-files = {
-    'Stable-Diffusion Checkpoints': {
-        # 排列并显示当前列表中的键值
-        '$sort': True,
-
-        'Stable Diffusion': {
-            'v2.1': {
-                '768-v': {
-                    'ema-pruned': {
-                        'safetensors': [
-                            ModelFile(
-                                'https://huggingface.co/stabilityai/stable-diffusion-2-1/resolve/main/v2-1_768-ema-pruned.safetensors',
-                                'stable-diffusion-v2-1-786-v-ema-pruned.safetensors'),
-                            ModelFile(
-                                CONFIG_V2_V, 'stable-diffusion-v2-1-786-v-ema-pruned.yaml'),
+#目录中 `type` 值对应的文件类型
+FILE_TYPES = {
+    'model': ModelFile,
+    'vae': VaeFile,
+    'embedding': EmbeddingFile,
+}
+
+
+#模型目录
+#每个顶级类别都保存为JSON字符串,第一次选择该类别时才解析,以便更快地显示界面
+#带有 `url` 键的对象是一个文件,需要一起下载的多个文件使用数组
+catalog = {
+    'Stable-Diffusion Checkpoints': r'''
+    {
+        "$sort": true,
+        "Stable Diffusion": {
+            "v2.1": {
+                "768-v": {
+                    "ema-pruned": {
+                        "safetensors": [
+                            {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2-1/resolve/main/v2-1_768-ema-pruned.safetensors", "path": "stable-diffusion-v2-1-786-v-ema-pruned.safetensors"},
+                            {"type": "model", "url": "https://raw.githubusercontent.com/Stability-AI/stablediffusion/main/configs/stable-diffusion/v2-inference-v.yaml", "path": "stable-diffusion-v2-1-786-v-ema-pruned.yaml"}
                         ],
-                        'ckpt': [
-                            ModelFile(
-                                'https://huggingface.co/stabilityai/stable-diffusion-2-1/resolve/main/v2-1_768-ema-pruned.ckpt',
-                                'stable-diffusion-v2-1-786-v-ema-pruned.ckpt'),
-                            ModelFile(
-                                CONFIG_V2_V, 'stable-diffusion-v2-1-786-v-ema-pruned.yaml'),
+                        "ckpt": [
+                            {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2-1/resolve/main/v2-1_768-ema-pruned.ckpt", "path": "stable-diffusion-v2-1-786-v-ema-pruned.ckpt"},
+                            {"type": "model", "url": "https://raw.githubusercontent.com/Stability-AI/stablediffusion/main/configs/stable-diffusion/v2-inference-v.yaml", "path": "stable-diffusion-v2-1-786-v-ema-pruned.yaml"}
                         ]
                     },
-                    'nonema-pruned': {
-                        'safetensors': [
-                            ModelFile(
-                                'https://huggingface.co/stabilityai/stable-diffusion-2-1/resolve/main/v2-1_768-nonema-pruned.safetensors',
-                                'stable-diffusion-v2-1-786-v-nonema-pruned.safetensors'),
-                            ModelFile(
-                                CONFIG_V2_V, 'stable-diffusion-v2-1-786-v-ema-pruned.yaml'),
-                        ],
-                        'ckpt': [
-                            ModelFile(
-                                'https://huggingface.co/stabilityai/stable-diffusion-2-1/resolve/main/v2-1_768-nonema-pruned.ckpt',
-                                'stable-diffusion-v2-1-786-v-nonema-pruned.ckpt'),
-                            ModelFile(
-                                CONFIG_V2_V, 'stable-diffusion-v2-1-786-v-ema-pruned.yaml'),
+                    "nonema-pruned": {
+                        "safetensors": [
+                            {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2-1/resolve/main/v2-1_768-nonema-pruned.safetensors", "path": "stable-diffusion-v2-1-786-v-nonema-pruned.safetensors"},
+                            {"type": "model", "url": "https://raw.githubusercontent.com/Stability-AI/stablediffusion/main/configs/stable-diffusion/v2-inference-v.yaml", "path": "stable-diffusion-v2-1-786-v-ema-pruned.yaml"}
                         ],
+                        "ckpt": [
+                            {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2-1/resolve/main/v2-1_768-nonema-pruned.ckpt", "path": "stable-diffusion-v2-1-786-v-nonema-pruned.ckpt"},
+                            {"type": "model", "url": "https://raw.githubusercontent.com/Stability-AI/stablediffusion/main/configs/stable-diffusion/v2-inference-v.yaml", "path": "stable-diffusion-v2-1-786-v-ema-pruned.yaml"}
+                        ]
                     }
                 },
-                '512-base': {
-                    'ema-pruned': {
-                        'safetensors': ModelFile(
-                            'https://huggingface.co/stabilityai/stable-diffusion-2-1-base/resolve/main/v2-1_512-ema-pruned.safetensors',
-                            'stable-diffusion-v2-1-512-base-ema-pruned.safetensors'),
-                        'ckpt': ModelFile(
-                            'https://huggingface.co/stabilityai/stable-diffusion-2-1-base/resolve/main/v2-1_512-ema-pruned.ckpt',
-                            'stable-diffusion-v2-1-512-base-ema-pruned.ckpt'),
-                    },
-                    'nonema-pruned': {
-                        'safetensors': ModelFile(
-                            'https://huggingface.co/stabilityai/stable-diffusion-2-1-base/resolve/main/v2-1_512-nonema-pruned.safetensors',
-                            'stable-diffusion-v2-1-512-base-nonema-pruned.safetensors'),
-                        'ckpt': ModelFile(
-                            'https://huggingface.co/stabilityai/stable-diffusion-2-1-base/resolve/main/v2-1_512-nonema-pruned.ckpt',
-                            'stable-diffusion-v2-1-512-base-nonema-pruned.ckpt'),
+                "512-base": {
+                    "ema-pruned": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2-1-base/resolve/main/v2-1_512-ema-pruned.safetensors", "path": "stable-diffusion-v2-1-512-base-ema-pruned.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2-1-base/resolve/main/v2-1_512-ema-pruned.ckpt", "path": "stable-diffusion-v2-1-512-base-ema-pruned.ckpt"}
                     },
-                },
+                    "nonema-pruned": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2-1-base/resolve/main/v2-1_512-nonema-pruned.safetensors", "path": "stable-diffusion-v2-1-512-base-nonema-pruned.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2-1-base/resolve/main/v2-1_512-nonema-pruned.ckpt", "path": "stable-diffusion-v2-1-512-base-nonema-pruned.ckpt"}
+                    }
+                }
             },
-            'v2.0': {
-                '768-v-ema': {
-                    'safetensors': [
-                        ModelFile(
-                            'https://huggingface.co/stabilityai/stable-diffusion-2/resolve/main/768-v-ema.safetensors',
-                            'stable-diffusion-v2-0-786-v-ema.safetensors'),
-                        ModelFile(
-                            CONFIG_V2_V, 'stable-diffusion-v2-1-786-v-ema-pruned.yaml'),
+            "v2.0": {
+                "768-v-ema": {
+                    "safetensors": [
+                        {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2/resolve/main/768-v-ema.safetensors", "path": "stable-diffusion-v2-0-786-v-ema.safetensors"},
+                        {"type": "model", "url": "https://raw.githubusercontent.com/Stability-AI/stablediffusion/main/configs/stable-diffusion/v2-inference-v.yaml", "path": "stable-diffusion-v2-1-786-v-ema-pruned.yaml"}
                     ],
-                    'ckpt': [
-                        ModelFile(
-                            'https://huggingface.co/stabilityai/stable-diffusion-2/resolve/main/768-v-ema.ckpt',
-                            'stable-diffusion-v2-0-786-v-ema.ckpt'),
-                        ModelFile(
-                            CONFIG_V2_V, 'stable-diffusion-v2-1-786-v-ema-pruned.yaml'),
-                    ],
-                },
-                '512-base-ema': {
-                    'safetensors': ModelFile(
-                        'https://huggingface.co/stabilityai/stable-diffusion-2-base/resolve/main/512-base-ema.safetensors',
-                        'stable-diffusion-v2-0-512-base-ema.safetensors'),
-                    'ckpt': ModelFile(
-                        'https://huggingface.co/stabilityai/stable-diffusion-2-base/resolve/main/512-base-ema.ckpt',
-                        'stable-diffusion-v2-0-512-base-ema.ckpt'),
+                    "ckpt": [
+                        {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2/resolve/main/768-v-ema.ckpt", "path": "stable-diffusion-v2-0-786-v-ema.ckpt"},
+                        {"type": "model", "url": "https://raw.githubusercontent.com/Stability-AI/stablediffusion/main/configs/stable-diffusion/v2-inference-v.yaml", "path": "stable-diffusion-v2-1-786-v-ema-pruned.yaml"}
+                    ]
                 },
+                "512-base-ema": {
+                    "safetensors": {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2-base/resolve/main/512-base-ema.safetensors", "path": "stable-diffusion-v2-0-512-base-ema.safetensors"},
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/stabilityai/stable-diffusion-2-base/resolve/main/512-base-ema.ckpt", "path": "stable-diffusion-v2-0-512-base-ema.ckpt"}
+                }
             },
-            'v1.5': {
-                'pruned-emaonly': {
-                    'ckpt': ModelFile(
-                        'https://huggingface.co/runwayml/stable-diffusion-v1-5/resolve/main/v1-5-pruned-emaonly.ckpt',
-                        'stable-diffusion-v1-5-pruned-emaonly.ckpt')
+            "v1.5": {
+                "pruned-emaonly": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/runwayml/stable-diffusion-v1-5/resolve/main/v1-5-pruned-emaonly.ckpt", "path": "stable-diffusion-v1-5-pruned-emaonly.ckpt"}
                 },
-                'pruned': {
-                    'ckpt': ModelFile(
-                        'https://huggingface.co/runwayml/stable-diffusion-v1-5/resolve/main/v1-5-pruned.ckpt',
-                        'stable-diffusion-v1-5-pruned.ckpt')
-                },
-            },
+                "pruned": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/runwayml/stable-diffusion-v1-5/resolve/main/v1-5-pruned.ckpt", "path": "stable-diffusion-v1-5-pruned.ckpt"}
+                }
+            }
         },
-
-        'Dreamlike': {
-            'photoreal': {
-                'v2.0': {
-                    'safetensors': ModelFile('https://huggingface.co/dreamlike-art/dreamlike-photoreal-2.0/resolve/main/dreamlike-photoreal-2.0.safetensors'),
-                    'ckpt': ModelFile('https://huggingface.co/dreamlike-art/dreamlike-photoreal-2.0/resolve/main/dreamlike-photoreal-2.0.ckpt')
-                },
-                'v1.0': {
-                    'ckpt': ModelFile('https://huggingface.co/dreamlike-art/dreamlike-photoreal-1.0/resolve/main/dreamlike-photoreal-1.0.ckpt')
+        "Dreamlike": {
+            "photoreal": {
+                "v2.0": {
+                    "safetensors": {"type": "model", "url": "https://huggingface.co/dreamlike-art/dreamlike-photoreal-2.0/resolve/main/dreamlike-photoreal-2.0.safetensors"},
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/dreamlike-art/dreamlike-photoreal-2.0/resolve/main/dreamlike-photoreal-2.0.ckpt"}
                 },
+                "v1.0": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/dreamlike-art/dreamlike-photoreal-1.0/resolve/main/dreamlike-photoreal-1.0.ckpt"}
+                }
             },
-            'diffusion': {
-                'v1.0': {
-                    'safetensors': ModelFile('https://huggingface.co/dreamlike-art/dreamlike-diffusion-1.0/resolve/main/dreamlike-diffusion-1.0.safetensors'),
-                    'ckpt': ModelFile('https://huggingface.co/dreamlike-art/dreamlike-diffusion-1.0/resolve/main/dreamlike-diffusion-1.0.ckpt')
-                },
+            "diffusion": {
+                "v1.0": {
+                    "safetensors": {"type": "model", "url": "https://huggingface.co/dreamlike-art/dreamlike-diffusion-1.0/resolve/main/dreamlike-diffusion-1.0.safetensors"},
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/dreamlike-art/dreamlike-diffusion-1.0/resolve/main/dreamlike-diffusion-1.0.ckpt"}
+                }
             }
         },
-
-        'Waifu Diffusion': {
-            'v1.4': {
-                'anime': {
-                    'e2': {
-                        'fp16': {
-                            'safetensors': [
-                                ModelFile(
-                                    'https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp16.safetensors'),
-                                ModelFile(
-                                    'https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp16.yaml')
+        "Waifu Diffusion": {
+            "v1.4": {
+                "anime": {
+                    "e2": {
+                        "fp16": {
+                            "safetensors": [
+                                {"type": "model", "url": "https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp16.safetensors"},
+                                {"type": "model", "url": "https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp16.yaml"}
                             ],
-                            'ckpt': [
-                                ModelFile(
-                                    'https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp16.ckpt'),
-                                ModelFile(
-                                    'https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp16.yaml')
+                            "ckpt": [
+                                {"type": "model", "url": "https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp16.ckpt"},
+                                {"type": "model", "url": "https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp16.yaml"}
                             ]
                         },
-                        'fp32': {
-                            'safetensors': [
-                                ModelFile(
-                                    'https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp32.safetensors'),
-                                ModelFile(
-                                    'https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp32.yaml')
+                        "fp32": {
+                            "safetensors": [
+                                {"type": "model", "url": "https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp32.safetensors"},
+                                {"type": "model", "url": "https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp32.yaml"}
                             ],
-                            'ckpt': [
-                                ModelFile(
-                                    'https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp32.ckpt'),
-                                ModelFile(
-                                    'https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp32.yaml')
+                            "ckpt": [
+                                {"type": "model", "url": "https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp32.ckpt"},
+                                {"type": "model", "url": "https://huggingface.co/saltacc/wd-1-4-anime/resolve/main/wd-1-4-epoch2-fp32.yaml"}
                             ]
-                        },
+                        }
                     },
-                    'e1': {
-                        'ckpt': [
-                            ModelFile(
-                                'https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/wd-1-4-anime_e1.ckpt'),
-                            ModelFile(
-                                'https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/wd-1-4-anime_e1.yaml'),
+                    "e1": {
+                        "ckpt": [
+                            {"type": "model", "url": "https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/wd-1-4-anime_e1.ckpt"},
+                            {"type": "model", "url": "https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/wd-1-4-anime_e1.yaml"}
                         ]
-                    },
-                },
-                'booru-step-14000-unofficial': {
-                    'safetensors': ModelFile('https://huggingface.co/waifu-diffusion/unofficial-releases/resolve/main/wd14-booru-step-14000-unofficial.safetensors'),
+                    }
                 },
+                "booru-step-14000-unofficial": {
+                    "safetensors": {"type": "model", "url": "https://huggingface.co/waifu-diffusion/unofficial-releases/resolve/main/wd14-booru-step-14000-unofficial.safetensors"}
+                }
             },
-            'v1.3.5': {
-                '80000-fp32': {
-                    'ckpt': ModelFile('https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/models/wd-1-3-5_80000-fp32.ckpt'),
+            "v1.3.5": {
+                "80000-fp32": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/models/wd-1-3-5_80000-fp32.ckpt"}
                 },
-                'penultimate-ucg-cont': {
-                    'ckpt': ModelFile('https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/models/wd-1-3-penultimate-ucg-cont.ckpt'),
+                "penultimate-ucg-cont": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/models/wd-1-3-penultimate-ucg-cont.ckpt"}
                 }
             },
-            'v1.3': {
-                'fp16': {
-                    'ckpt': ModelFile('https://huggingface.co/hakurei/waifu-diffusion-v1-3/resolve/main/wd-v1-3-float16.ckpt')
-                },
-                'fp32': {
-                    'ckpt': ModelFile('https://huggingface.co/hakurei/waifu-diffusion-v1-3/resolve/main/wd-v1-3-float32.ckpt')
+            "v1.3": {
+                "fp16": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/hakurei/waifu-diffusion-v1-3/resolve/main/wd-v1-3-float16.ckpt"}
                 },
-                'full': {
-                    'ckpt': ModelFile('https://huggingface.co/hakurei/waifu-diffusion-v1-3/resolve/main/wd-v1-3-full.ckpt')
+                "fp32": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/hakurei/waifu-diffusion-v1-3/resolve/main/wd-v1-3-float32.ckpt"}
                 },
-                'full-opt': {
-                    'ckpt': ModelFile('https://huggingface.co/hakurei/waifu-diffusion-v1-3/resolve/main/wd-v1-3-full-opt.ckpt')
+                "full": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/hakurei/waifu-diffusion-v1-3/resolve/main/wd-v1-3-full.ckpt"}
                 },
-            },
+                "full-opt": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/hakurei/waifu-diffusion-v1-3/resolve/main/wd-v1-3-full-opt.ckpt"}
+                }
+            }
         },
-
-        'TrinArt': {
-            'derrida_characters': {
-                'v2': {
-                    'final': {
-                        'ckpt': ModelFile(
-                            'https://huggingface.co/naclbit/trinart_derrida_characters_v2_stable_diffusion/resolve/main/derrida_final.ckpt',
-                            'trinart_characters_v2_final.ckpt')
-                    },
-                },
-                'v1 (19.2m)': {
-                    'ckpt': ModelFile('https://huggingface.co/naclbit/trinart_characters_19.2m_stable_diffusion_v1/resolve/main/trinart_characters_it4_v1.ckpt')
+        "TrinArt": {
+            "derrida_characters": {
+                "v2": {
+                    "final": {
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/naclbit/trinart_derrida_characters_v2_stable_diffusion/resolve/main/derrida_final.ckpt", "path": "trinart_characters_v2_final.ckpt"}
+                    }
                 },
+                "v1 (19.2m)": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/naclbit/trinart_characters_19.2m_stable_diffusion_v1/resolve/main/trinart_characters_it4_v1.ckpt"}
+                }
             },
-            'v2': {
-                '115000': {
-                    'ckpt': ModelFile('https://huggingface.co/naclbit/trinart_stable_diffusion_v2/resolve/main/trinart2_step115000.ckpt'),
-                },
-                '95000': {
-                    'ckpt': ModelFile('https://huggingface.co/naclbit/trinart_stable_diffusion_v2/resolve/main/trinart2_step95000.ckpt'),
+            "v2": {
+                "115000": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/naclbit/trinart_stable_diffusion_v2/resolve/main/trinart2_step115000.ckpt"}
                 },
-                '60000': {
-                    'ckpt': ModelFile('https://huggingface.co/naclbit/trinart_stable_diffusion_v2/resolve/main/trinart2_step60000.ckpt'),
+                "95000": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/naclbit/trinart_stable_diffusion_v2/resolve/main/trinart2_step95000.ckpt"}
                 },
-            },
+                "60000": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/naclbit/trinart_stable_diffusion_v2/resolve/main/trinart2_step60000.ckpt"}
+                }
+            }
         },
-
-        'AniReal': {
-            'v1.0': {
-                'safetensors': ModelFile('https://huggingface.co/Hosioka/AniReal/resolve/main/AniReal.safetensors')
+        "AniReal": {
+            "v1.0": {
+                "safetensors": {"type": "model", "url": "https://huggingface.co/Hosioka/AniReal/resolve/main/AniReal.safetensors"}
             }
         },
-
-        'OrangeMixs': {
-            'AbyssOrangeMix': {
-                '2': {
-                    'hard': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix2/AbyssOrangeMix2_hard.safetensors'),
+        "OrangeMixs": {
+            "AbyssOrangeMix": {
+                "2": {
+                    "hard": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix2/AbyssOrangeMix2_hard.safetensors"}
                     },
-                    'nsfw': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix2/AbyssOrangeMix2_nsfw.safetensors'),
+                    "nsfw": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix2/AbyssOrangeMix2_nsfw.safetensors"}
                     },
-                    'sfw': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix2/AbyssOrangeMix2_sfw.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix2/AbyssOrangeMix2_sfw.ckpt')
+                    "sfw": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix2/AbyssOrangeMix2_sfw.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix2/AbyssOrangeMix2_sfw.ckpt"}
                     }
                 },
-                '1': {
-                    'half': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix/AbyssOrangeMix_half.safetensors'),
-                    },
-                    'night': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix/AbyssOrangeMix_Night.safetensors'),
+                "1": {
+                    "half": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix/AbyssOrangeMix_half.safetensors"}
                     },
-                    'base': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix/AbyssOrangeMix.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix/AbyssOrangeMix_base.ckpt'),
+                    "night": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix/AbyssOrangeMix_Night.safetensors"}
                     },
+                    "base": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix/AbyssOrangeMix.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/AbyssOrangeMix/AbyssOrangeMix_base.ckpt"}
+                    }
                 }
             },
-            'EerieOrangeMix': {
-                '2': {
-                    'half': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix2_half.safetensors'),
+            "EerieOrangeMix": {
+                "2": {
+                    "half": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix2_half.safetensors"}
                     },
-                    'night': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix2_night.safetensors'),
+                    "night": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix2_night.safetensors"}
                     },
-                    'base': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix2.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix2_base.ckpt'),
+                    "base": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix2.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix2_base.ckpt"}
                     }
                 },
-                '1': {
-                    'half': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix_half.safetensors'),
+                "1": {
+                    "half": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix_half.safetensors"}
                     },
-                    'night': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix_night.safetensors'),
+                    "night": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix_night.safetensors"}
                     },
-                    'base': {
-                        'safetensors': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix_base.ckpt'),
+                    "base": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/WarriorMama777/OrangeMixs/resolve/main/Models/EerieOrangeMix/EerieOrangeMix_base.ckpt"}
                     }
-                },
-            },
+                }
+            }
         },
-
-        'Anything': {
-            'v4.5 (unofficial merge)': {
-                'safetensors': ModelFile('https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.5-pruned.safetensors'),
-                'ckpt': ModelFile('https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.5-pruned.ckpt'),
+        "Anything": {
+            "v4.5 (unofficial merge)": {
+                "safetensors": {"type": "model", "url": "https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.5-pruned.safetensors"},
+                "ckpt": {"type": "model", "url": "https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.5-pruned.ckpt"}
             },
-            'v4.0 (unofficial merge)': {
-                'pruned': {
-                    'fp16': {
-                        'safetensors': ModelFile('https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned-fp16.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned-fp16.ckpt'),
+            "v4.0 (unofficial merge)": {
+                "pruned": {
+                    "fp16": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned-fp16.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned-fp16.ckpt"}
                     },
-                    'fp32': {
-                        'safetensors': ModelFile('https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned-fp32.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned-fp32.ckpt'),
+                    "fp32": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned-fp32.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned-fp32.ckpt"}
                     },
-                    'safetensors': ModelFile('https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned.safetensors'),
-                    'ckpt': ModelFile('https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned.ckpt'),
+                    "safetensors": {"type": "model", "url": "https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned.safetensors"},
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/andite/anything-v4.0/resolve/main/anything-v4.0-pruned.ckpt"}
                 }
             }
         },
-
-        'Protogen': {
-            'v8.6 Infinity': {
-                'ckpt': ModelFile(
-                    'https://huggingface.co/darkstorm2150/Protogen_Infinity_Official_Release/resolve/main/model.ckpt',
-                    'ProtoGen_Infinity.ckpt')
+        "Protogen": {
+            "v8.6 Infinity": {
+                "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_Infinity_Official_Release/resolve/main/model.ckpt", "path": "ProtoGen_Infinity.ckpt"}
             },
-            'v8.0 Nova (Experimental)': {
-                'ckpt': ModelFile(
-                    'https://huggingface.co/darkstorm2150/Protogen_Nova_Official_Release/resolve/main/model.ckpt',
-                    'ProtoGen_Nova.ckpt')
+            "v8.0 Nova (Experimental)": {
+                "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_Nova_Official_Release/resolve/main/model.ckpt", "path": "ProtoGen_Nova.ckpt"}
             },
-            'v7.4 Eclipse (Advanced)': {
-                'ckpt': ModelFile(
-                    'https://huggingface.co/darkstorm2150/Protogen_Eclipse_Official_Release/resolve/main/model.ckpt',
-                    'ProtoGen_Eclipse.ckpt')
+            "v7.4 Eclipse (Advanced)": {
+                "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_Eclipse_Official_Release/resolve/main/model.ckpt", "path": "ProtoGen_Eclipse.ckpt"}
             },
-            'v5.9 Dragon (RPG themes)': {
-                'pruned': {
-                    'fp16': {
-                        'safetensors': ModelFile('https://huggingface.co/darkstorm2150/Protogen_Dragon_Official_Release/resolve/main/ProtoGen_Dragon-pruned-fp16.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/darkstorm2150/Protogen_Dragon_Official_Release/resolve/main/ProtoGen_Dragon-pruned-fp16.ckpt'),
+            "v5.9 Dragon (RPG themes)": {
+                "pruned": {
+                    "fp16": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_Dragon_Official_Release/resolve/main/ProtoGen_Dragon-pruned-fp16.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_Dragon_Official_Release/resolve/main/ProtoGen_Dragon-pruned-fp16.ckpt"}
                     }
                 },
-                'safetensors': ModelFile('https://huggingface.co/darkstorm2150/Protogen_Dragon_Official_Release/resolve/main/ProtoGen_Dragon.safetensors'),
-                'ckpt': ModelFile('https://huggingface.co/darkstorm2150/Protogen_Dragon_Official_Release/resolve/main/ProtoGen_Dragon.ckpt'),
+                "safetensors": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_Dragon_Official_Release/resolve/main/ProtoGen_Dragon.safetensors"},
+                "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_Dragon_Official_Release/resolve/main/ProtoGen_Dragon.ckpt"}
             },
-            'v5.8 (Sci-Fi/Anime)': {
-                'pruned': {
-                    'fp16': {
-                        'safetensors': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x5.8_Official_Release/resolve/main/ProtoGen_X5.8-pruned-fp16.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x5.8_Official_Release/resolve/main/ProtoGen_X5.8-pruned-fp16.ckpt'),
+            "v5.8 (Sci-Fi/Anime)": {
+                "pruned": {
+                    "fp16": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x5.8_Official_Release/resolve/main/ProtoGen_X5.8-pruned-fp16.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x5.8_Official_Release/resolve/main/ProtoGen_X5.8-pruned-fp16.ckpt"}
                     }
                 },
-                'safetensors': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x5.8_Official_Release/resolve/main/ProtoGen_X5.8.safetensors'),
-                'ckpt': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x5.8_Official_Release/resolve/main/ProtoGen_X5.8.ckpt'),
+                "safetensors": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x5.8_Official_Release/resolve/main/ProtoGen_X5.8.safetensors"},
+                "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x5.8_Official_Release/resolve/main/ProtoGen_X5.8.ckpt"}
             },
-            'v5.3 (Photorealism)': {
-                'pruned': {
-                    'fp16': {
-                        'safetensors': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x5.3_Official_Release/resolve/main/ProtoGen_X5.3-pruned-fp16.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x5.3_Official_Release/resolve/main/ProtoGen_X5.3-pruned-fp16.ckpt'),
+            "v5.3 (Photorealism)": {
+                "pruned": {
+                    "fp16": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x5.3_Official_Release/resolve/main/ProtoGen_X5.3-pruned-fp16.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x5.3_Official_Release/resolve/main/ProtoGen_X5.3-pruned-fp16.ckpt"}
                     }
                 },
-                'safetensors': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x5.3_Official_Release/resolve/main/ProtoGen_X5.3.safetensors'),
-                'ckpt': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x5.3_Official_Release/resolve/main/ProtoGen_X5.3.ckpt'),
+                "safetensors": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x5.3_Official_Release/resolve/main/ProtoGen_X5.3.safetensors"},
+                "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x5.3_Official_Release/resolve/main/ProtoGen_X5.3.ckpt"}
             },
-            'v3.4 (Photorealism)': {
-                'pruned': {
-                    'fp16': {
-                        'safetensors': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x3.4_Official_Release/resolve/main/ProtoGen_X3.4-pruned-fp16.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x3.4_Official_Release/resolve/main/ProtoGen_X3.4-pruned-fp16.ckpt'),
+            "v3.4 (Photorealism)": {
+                "pruned": {
+                    "fp16": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x3.4_Official_Release/resolve/main/ProtoGen_X3.4-pruned-fp16.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x3.4_Official_Release/resolve/main/ProtoGen_X3.4-pruned-fp16.ckpt"}
                     }
                 },
-                'safetensors': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x3.4_Official_Release/resolve/main/ProtoGen_X3.4.safetensors'),
-                'ckpt': ModelFile('https://huggingface.co/darkstorm2150/Protogen_x3.4_Official_Release/resolve/main/ProtoGen_X3.4.ckpt'),
+                "safetensors": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x3.4_Official_Release/resolve/main/ProtoGen_X3.4.safetensors"},
+                "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_x3.4_Official_Release/resolve/main/ProtoGen_X3.4.ckpt"}
             },
-            'v2.2 (Anime)': {
-                'pruned': {
-                    'fp16': {
-                        'safetensors': ModelFile('https://huggingface.co/darkstorm2150/Protogen_v2.2_Official_Release/resolve/main/Protogen_V2.2-pruned-fp16.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/darkstorm2150/Protogen_v2.2_Official_Release/resolve/main/Protogen_V2.2-pruned-fp16.ckpt'),
+            "v2.2 (Anime)": {
+                "pruned": {
+                    "fp16": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_v2.2_Official_Release/resolve/main/Protogen_V2.2-pruned-fp16.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_v2.2_Official_Release/resolve/main/Protogen_V2.2-pruned-fp16.ckpt"}
                     }
                 },
-                'safetensors': ModelFile('https://huggingface.co/darkstorm2150/Protogen_v2.2_Official_Release/resolve/main/Protogen_V2.2.safetensors'),
-                'ckpt': ModelFile('https://huggingface.co/darkstorm2150/Protogen_v2.2_Official_Release/resolve/main/Protogen_V2.2.ckpt'),
-            },
+                "safetensors": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_v2.2_Official_Release/resolve/main/Protogen_V2.2.safetensors"},
+                "ckpt": {"type": "model", "url": "https://huggingface.co/darkstorm2150/Protogen_v2.2_Official_Release/resolve/main/Protogen_V2.2.ckpt"}
+            }
         },
-
-        '7th_Layer': {
-            '7th_anime': {
-                'v3.0': {
-                    'A': {
-                        'safetensors': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_A.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_A.ckpt'),
-                    },
-                    'B': {
-                        'safetensors': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_B.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_B.ckpt'),
+        "7th_Layer": {
+            "7th_anime": {
+                "v3.0": {
+                    "A": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_A.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_A.ckpt"}
                     },
-                    'C': {
-                        'safetensors': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_C.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_C.ckpt'),
+                    "B": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_B.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_B.ckpt"}
                     },
+                    "C": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_C.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v3/7th_anime_v3_C.ckpt"}
+                    }
                 },
-                'v2.0': {
-                    'A': {
-                        'safetensors': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_A.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_A.ckpt'),
-                    },
-                    'B': {
-                        'safetensors': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_B.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_B.ckpt'),
+                "v2.0": {
+                    "A": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_A.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_A.ckpt"}
                     },
-                    'C': {
-                        'safetensors': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_C.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_C.ckpt'),
+                    "B": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_B.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_B.ckpt"}
                     },
-                    'G': {
-                        'safetensors': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_G.safetensors'),
-                        'ckpt': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_G.ckpt'),
+                    "C": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_C.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_C.ckpt"}
                     },
+                    "G": {
+                        "safetensors": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_G.safetensors"},
+                        "ckpt": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v2/7th_anime_v2_G.ckpt"}
+                    }
                 },
-                'v1.1': {
-                    'safetensors': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v1/7th_anime_v1.1.safetensors'),
-                    'ckpt': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v1/7th_anime_v1.1.ckpt'),
-                },
+                "v1.1": {
+                    "safetensors": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v1/7th_anime_v1.1.safetensors"},
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_anime_v1/7th_anime_v1.1.ckpt"}
+                }
             },
-            'abyss_7th_layer': {
-                'G1': {
-                    'ckpt': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_layer/abyss_7th_layerG1.ckpt'),
+            "abyss_7th_layer": {
+                "G1": {
+                    "ckpt": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_layer/abyss_7th_layerG1.ckpt"}
                 },
-                'ckpt': ModelFile('https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_layer/Abyss_7th_layer.ckpt')
+                "ckpt": {"type": "model", "url": "https://huggingface.co/syaimu/7th_Layer/resolve/main/7th_layer/Abyss_7th_layer.ckpt"}
             }
         }
-    },
-
-    'VAEs': {
-        '$sort': True,
-
-        'Stable Diffusion': {
-            'vae-ft-mse-840000': {
-                'pruned': {
-                    'safetensors': VaeFile(
-                        'https://huggingface.co/stabilityai/sd-vae-ft-mse-original/resolve/main/vae-ft-mse-840000-ema-pruned.safetensors',
-                        'stable-diffusion-vae-ft-mse-840000-ema-pruned.safetensors'),
-                    'ckpt': VaeFile(
-                        'https://huggingface.co/stabilityai/sd-vae-ft-mse-original/resolve/main/vae-ft-mse-840000-ema-pruned.ckpt',
-                        'stable-diffusion-vae-ft-mse-840000-ema-pruned.ckpt')
+    }
+    ''',
+
+    'VAEs': r'''
+    {
+        "$sort": true,
+        "Stable Diffusion": {
+            "vae-ft-mse-840000": {
+                "pruned": {
+                    "safetensors": {"type": "vae", "url": "https://huggingface.co/stabilityai/sd-vae-ft-mse-original/resolve/main/vae-ft-mse-840000-ema-pruned.safetensors", "path": "stable-diffusion-vae-ft-mse-840000-ema-pruned.safetensors"},
+                    "ckpt": {"type": "vae", "url": "https://huggingface.co/stabilityai/sd-vae-ft-mse-original/resolve/main/vae-ft-mse-840000-ema-pruned.ckpt", "path": "stable-diffusion-vae-ft-mse-840000-ema-pruned.ckpt"}
                 }
             },
-            'vae-ft-ema-560000': {
-                'safetensors': VaeFile(
-                    'https://huggingface.co/stabilityai/sd-vae-ft-ema-original/resolve/main/vae-ft-ema-560000-ema-pruned.safetensors',
-                    'stable-diffusion-vae-ft-ema-560000-ema-pruned.safetensors'),
-                'ckpt': VaeFile(
-                    'https://huggingface.co/stabilityai/sd-vae-ft-ema-original/resolve/main/vae-ft-ema-560000-ema-pruned.ckpt',
-                    'stable-diffusion-vae-ft-ema-560000-ema-pruned.ckpt'),
+            "vae-ft-ema-560000": {
+                "safetensors": {"type": "vae", "url": "https://huggingface.co/stabilityai/sd-vae-ft-ema-original/resolve/main/vae-ft-ema-560000-ema-pruned.safetensors", "path": "stable-diffusion-vae-ft-ema-560000-ema-pruned.safetensors"},
+                "ckpt": {"type": "vae", "url": "https://huggingface.co/stabilityai/sd-vae-ft-ema-original/resolve/main/vae-ft-ema-560000-ema-pruned.ckpt", "path": "stable-diffusion-vae-ft-ema-560000-ema-pruned.ckpt"}
             }
         },
-
-        'Waifu Diffusion': {
-            'v1.4': {
-                'kl-f8-anime': {
-                    'e2': {
-                        'ckpt': VaeFile('https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/vae/kl-f8-anime2.ckpt'),
+        "Waifu Diffusion": {
+            "v1.4": {
+                "kl-f8-anime": {
+                    "e2": {
+                        "ckpt": {"type": "vae", "url": "https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/vae/kl-f8-anime2.ckpt"}
                     },
-                    'e1': {
-                        'ckpt': VaeFile('https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/vae/kl-f8-anime.ckpt'),
+                    "e1": {
+                        "ckpt": {"type": "vae", "url": "https://huggingface.co/hakurei/waifu-diffusion-v1-4/resolve/main/vae/kl-f8-anime.ckpt"}
                     }
-                },
-            },
+                }
+            }
         },
-
-        'TrinArt': {
-            'autoencoder_fix_kl-f8-trinart_characters': {
-                'ckpt': ModelFile('https://huggingface.co/naclbit/trinart_derrida_characters_v2_stable_diffusion/resolve/main/autoencoder_fix_kl-f8-trinart_characters.ckpt')
+        "TrinArt": {
+            "autoencoder_fix_kl-f8-trinart_characters": {
+                "ckpt": {"type": "model", "url": "https://huggingface.co/naclbit/trinart_derrida_characters_v2_stable_diffusion/resolve/main/autoencoder_fix_kl-f8-trinart_characters.ckpt"}
             }
         },
-
-        'NovelAI': {
-            'animevae.pt': VaeFile('https://huggingface.co/gozogo123/anime-vae/resolve/main/animevae.pt')
+        "NovelAI": {
+            "animevae.pt": {"type": "vae", "url": "https://huggingface.co/gozogo123/anime-vae/resolve/main/animevae.pt"}
         }
-    },
-
-    'Textual Inversion (embeddings)': {
-        '$sort': True,
-
-        'bad_prompt (negative embedding)': {
-            'Version 2': EmbeddingFile('https://huggingface.co/datasets/Nerfgun3/bad_prompt/resolve/main/bad_prompt_version2.pt'),
-            'Version 1': EmbeddingFile('https://huggingface.co/datasets/Nerfgun3/bad_prompt/resolve/main/bad_prompt.pt'),
-        },
     }
+    ''',
+
+    'Textual Inversion (embeddings)': r'''
+    {
+        "$sort": true,
+        "bad_prompt (negative embedding)": {
+            "Version 2": {"type": "embedding", "url": "https://huggingface.co/datasets/Nerfgun3/bad_prompt/resolve/main/bad_prompt_version2.pt"},
+            "Version 1": {"type": "embedding", "url": "https://huggingface.co/datasets/Nerfgun3/bad_prompt/resolve/main/bad_prompt.pt"}
+        }
+    }
+    ''',
 }
 
+#解析后的文件对象和排列后的键值,以条目的id为键缓存
+file_cache: Dict[int, List[File]] = {}
+options_cache: Dict[int, List[str]] = {}
 
-def global_disable(disabled: bool):
-    for dropdown in dropdowns.children:
-        dropdown.disabled = disabled
 
-    download_button.disabled = disabled
+#等待下载的任务 (名称, 文件列表),第一个任务之前是当前正在下载的任务
+download_queue: List[tuple] = []
+current_task: Union[tuple, None] = None
+queue_lock = threading.Lock()
+queue_event = threading.Event()
 
-    # 如果最后一个下拉菜单是子下拉菜单,请禁用按钮
-    if not disabled:
-        dropdown = dropdowns.children[len(dropdowns.children) - 1]
-        download_button.disabled = isinstance(dropdown, dict)
 
+def render_queue() -> None:
+    with queue_lock:
+        options = [(f'{label}', i) for i, (label, _) in enumerate(download_queue)]
+        if current_task:
+            options.insert(0, (f'▶ {current_task[0]}', -1))
 
-def on_download(_):
-    dropdown = dropdowns.children[len(dropdowns.children) - 1]
-    entry = dropdown.entries[dropdown.value]
+    value = queue_select.value
+    queue_select.options = options
+    if value in [index for _, index in options]:
+        queue_select.value = value
+
+
+def queue_worker() -> None:
+    """
+    在后台依次处理下载队列,因此在下载时也可以继续浏览和添加条目
+    """
+    global current_task
+
+    while True:
+        queue_event.wait()
+
+        with queue_lock:
+            if not download_queue:
+                queue_event.clear()
+                continue
 
-    global_disable(True)
+            current_task = download_queue.pop(0)
 
-    #接收单个文件
-    if isinstance(entry, File):
-        entry.download()
+        cancel_event.clear()
+        render_queue()
 
-    #接收多个文件
-    elif isinstance(entry, list):
-        for file in entry:
-            file.download()
+        try:
+            download_files(current_task[1])
+        except Exception as e:
+            output.append_stdout(f'下载失败:{e}\n')
 
-    #TODO:错误处理
+        with queue_lock:
+            current_task = None
+            finished = not download_queue
+
+        render_queue()
+        refresh_dropdowns()
+
+        if finished and DISCONNECT_RUNTIME:
+            #等待所有文件移动到驱动器
+            wait_uploads()
+
+            #等待期间又添加了条目的话继续下载,不关闭运行时
+            with queue_lock:
+                if download_queue:
+                    continue
+
+            output.append_stdout('文件已成功移动,现在可以关闭运行时了.\n')
+
+            #如果立即退出运行时,最后一次输出将被截断
+            time.sleep(1)
+            runtime.unassign()
+
+
+def on_download(_):
+    #正在搜索时下载选中的搜索结果
+    if search_box.value.strip():
+        if search_results.value is None:
+            return
+
+        label, _, entry = search_index[search_results.value]
     else:
-        pass
+        dropdown = dropdowns.children[len(dropdowns.children) - 1]
+        entry = get_entry(dropdown.entries, dropdown.value)
+        label = ' / '.join(str(d.value) for d in dropdowns.children)
+
+    if not is_file_entry(entry):
+        return
+
+    files = load_files(entry)
+
+    mount_drive()
+
+    with queue_lock:
+        #忽略已在队列中的条目,搜索结果和下拉列表的名称不同,因此比较条目本身的文件列表
+        if any(queued is files for _, queued in download_queue):
+            return
+        if current_task and current_task[1] is files:
+            return
+
+        download_queue.append((label, files))
+        queue_event.set()
+
+    render_queue()
+
+
+def on_queue_move(offset: int):
+    def handler(_):
+        index = queue_select.value
+        if index is None or index < 0:
+            return
+
+        with queue_lock:
+            target = index + offset
+            if not 0 <= target < len(download_queue):
+                return
+
+            download_queue[index], download_queue[target] = download_queue[target], download_queue[index]
+
+        render_queue()
+        queue_select.value = target
+
+    return handler
+
+
+def on_queue_cancel(_):
+    index = queue_select.value
+    if index is None:
+        return
+
+    #取消当前正在下载的任务
+    if index < 0:
+        cancel_event.set()
+        return
+
+    with queue_lock:
+        if index < len(download_queue):
+            download_queue.pop(index)
+
+    render_queue()
+
+
+def get_entry(entries: Dict, key: str):
+    entry = entries[key]
+
+    #第一次选择时解析该类别
+    if isinstance(entry, str):
+        entry = entries[key] = json.loads(entry)
+
+    return entry
+
+
+def is_file_entry(entry) -> bool:
+    return isinstance(entry, list) or (isinstance(entry, dict) and 'url' in entry)
+
+
+def load_files(entry: Union[List, Dict]) -> List[File]:
+    files = file_cache.get(id(entry))
 
-    if DISCONNECT_RUNTIME:
-        print('文件已成功移动,现在可以关闭运行时了.')
+    if files is None:
+        files = [
+            FILE_TYPES[item['type']](
+                item['url'],
+                item.get('path'),
+                *item.get('args', []),
+                size=item.get('size'),
+                sha256=item.get('sha256'))
+            for item in (entry if isinstance(entry, list) else [entry])
+        ]
+        file_cache[id(entry)] = files
 
-        #如果立即退出运行时,最后一次输出将被截断
-        time.sleep(1)
-        runtime.unassign()
+    return files
 
-    global_disable(False)
+
+def sorted_keys(entries: Dict) -> List[str]:
+    keys = options_cache.get(id(entries))
+
+    if keys is None:
+        keys = [key for key in entries if key != '$sort']
+
+        #排列并显示当前列表中的键值
+        if entries.get('$sort') == True:
+            keys.sort()
+
+        options_cache[id(entries)] = keys
+
+    return keys
 
 
 def on_dropdown_change(event):
     dropdown: widgets.Dropdown = event['owner']
-    entries: Union[List, Dict] = dropdown.entries[event['new']]
+    entry = get_entry(dropdown.entries, event['new'])
 
     #删除所有上一个子下拉列表
     dropdowns.children = dropdowns.children[:dropdown.children_index + 1]
 
-    if isinstance(entries, dict):
-        download_button.disabled = True
-        create_dropdown(entries)
+    if is_file_entry(entry):
+        download_button.disabled = False
         return
 
     #创建子下拉列表
-    download_button.disabled = False
+    download_button.disabled = True
+    create_dropdown(entry)
 
 
-def create_dropdown(entries: Dict) -> widgets.Dropdown:
-    if '$sort' in entries and entries['$sort'] == True:
-        entries = {k: entries[k] for k in sorted(entries)}
-        del entries['$sort']
+def is_installed(entry) -> bool:
+    #尚未解析的类别
+    if not is_file_entry(entry):
+        return False
+
+    return all(file.installed for file in load_files(entry))
+
+
+def dropdown_options(entries: Dict) -> List[tuple]:
+    #在已下载的条目旁边显示标记
+    return [
+        (f'{key} ✓' if is_installed(entries[key]) else key, key)
+        for key in sorted_keys(entries)
+    ]
+
+
+def refresh_dropdowns() -> None:
+    """
+    重新读取模型文件索引后,更新已显示的下拉列表中的标记,保持当前选择
+    """
+    for dropdown in dropdowns.children:
+        value = dropdown.value
+
+        #更改选项时不触发子下拉列表的重新创建
+        dropdown.unobserve(on_dropdown_change, names='value')
+        dropdown.options = dropdown_options(dropdown.entries)
+        dropdown.value = value
+        dropdown.observe(on_dropdown_change, names='value')
 
-    options = list(entries.keys())
-    value = options[0]
+
+def create_dropdown(entries: Dict) -> widgets.Dropdown:
+    options = dropdown_options(entries)
+    value = options[0][1]
 
     dropdown = widgets.Dropdown(
         options=options,
@@ -685,7 +1045,128 @@ def create_dropdown(entries: Dict) -> widgets.Dropdown:
     return dropdown
 
 
+#所有文件条目的平面索引 (名称, 搜索用文本, 条目),第一次搜索时才创建
+search_index: Union[List[tuple], None] = None
+
+#上一次搜索的关键字和结果,输入的关键字延长时只在上一次结果中搜索
+last_search = ('', [])
+
+#最多显示的搜索结果数
+SEARCH_LIMIT = 200
+
+
+def build_search_index() -> List[tuple]:
+    index = []
+
+    def walk(entries: Dict, path: List[str]):
+        for key in sorted_keys(entries):
+            entry = get_entry(entries, key)
+
+            if not is_file_entry(entry):
+                walk(entry, path + [key])
+                continue
+
+            items = entry if isinstance(entry, list) else [entry]
+            file = items[0]
+
+            name = os.path.basename(urlparse(file['url']).path)
+            size = sum(item.get('size') or 0 for item in items)
+
+            label = ' / '.join(path + [key])
+            tags = [file['type'], os.path.splitext(name)[1].lstrip('.')]
+            if size:
+                tags.append(f'{size / 1024 ** 3:.1f}GB')
+
+            #路径中已包含基础模型名称 (例如 Stable Diffusion)
+            haystack = ' '.join([label, name, *tags]).lower()
+            index.append((f'{label} [{", ".join(tags)}]', haystack, entry))
+
+    walk(catalog, [])
+    return index
+
+
+def fuzzy_match(query: List[str], haystack: str) -> int:
+    """
+    所有关键字都按顺序出现在文本中时返回分数,否则返回-1
+    关键字完整出现时分数更高
+    """
+    score = 0
+
+    for word in query:
+        if word in haystack:
+            score += 2
+            continue
+
+        #关键字的每个字符按顺序出现即可
+        position = 0
+        for char in word:
+            position = haystack.find(char, position) + 1
+            if not position:
+                return -1
+
+        score += 1
+
+    return score
+
+
+def on_search(event):
+    global search_index, last_search
+
+    text = event['new'].strip().lower()
+
+    #清空关键字时恢复下拉列表
+    if not text:
+        search_results.layout.display = 'none'
+        dropdowns.layout.display = None
+        last_search = ('', [])
+
+        dropdown = dropdowns.children[len(dropdowns.children) - 1]
+        download_button.disabled = not is_file_entry(get_entry(dropdown.entries, dropdown.value))
+        return
+
+    if search_index is None:
+        search_index = build_search_index()
+
+    previous_text, previous_matches = last_search
+    if previous_text and text.startswith(previous_text):
+        candidates = previous_matches
+    else:
+        candidates = range(len(search_index))
+
+    query = text.split()
+    scored = []
+    for i in candidates:
+        score = fuzzy_match(query, search_index[i][1])
+        if score >= 0:
+            scored.append((-score, i))
+
+    matches = [i for _, i in scored]
+    last_search = (text, matches)
+
+    scored.sort()
+    search_results.options = [
+        (search_index[i][0], i)
+        for _, i in scored[:SEARCH_LIMIT]
+    ]
+
+    search_results.layout.display = None
+    dropdowns.layout.display = 'none'
+    download_button.disabled = search_results.value is None
+
+
+def on_search_select(event):
+    if search_box.value.strip():
+        download_button.disabled = event['new'] is None
+
+
 #创建第一个条目下拉列表
-create_dropdown(files)
+create_dropdown(catalog)
 
+search_box.observe(on_search, names='value')
+search_results.observe(on_search_select, names='value')
 download_button.on_click(on_download)
+queue_up_button.on_click(on_queue_move(-1))
+queue_down_button.on_click(on_queue_move(1))
+queue_cancel_button.on_click(on_queue_cancel)
+
+threading.Thread(target=queue_worker, daemon=True).start()
@@ -1,16 +1,34 @@
+import hashlib
+import mimetypes
 import os
+import re
 import sys
+import tempfile
 import threading
 import time
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
+from collections import OrderedDict
 from typing import Callable, Optional
 
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.routing import APIRoute
 from gradio import Blocks
 from modules import paths, shared
 from modules.script_callbacks import on_app_started
+from starlette.concurrency import run_in_threadpool
+
+# 썸네일로 만들 수 있는 이미지 확장자
+THUMBNAIL_SUFFIXES = ('.png', '.jpg', '.jpeg', '.webp')
+
+# 썸네일 크기 범위와 디스크 캐시 최대 용량
+THUMBNAIL_MIN_SIZE = 32
+THUMBNAIL_MAX_SIZE = 1024
+THUMBNAIL_CACHE_SIZE = 256 * 1024 * 1024
+
+# Range 응답을 보낼 때 한 번에 읽을 크기
+CHUNK_SIZE = 256 * 1024
 
 
 class Patches:
@@ -18,6 +36,22 @@ class Patches:
         self.demo = demo
         self.app = app
 
+        # 요청마다 경로를 다시 계산하지 않도록 접근을 허용할 경로를 미리 만들어두기
+        self.allowed_roots = frozenset([Path(shared.data_path).absolute()])
+
+        self.thumbnail_dir = Path(tempfile.gettempdir(), 'easy-sd-thumbnails')
+        self.thumbnail_dir.mkdir(0o777, True, True)
+        self.thumbnail_lock = threading.Lock()
+
+        # 썸네일 경로와 크기, 가장 오래 사용하지 않은 썸네일이 앞에 위치함
+        self.thumbnails: 'OrderedDict[Path, int]' = OrderedDict(
+            (path, stat.st_size)
+            for path, stat in sorted(
+                ((path, path.stat()) for path in self.thumbnail_dir.glob('*.webp')),
+                key=lambda item: item[1].st_atime
+            )
+        )
+
         self.patch_gradio_route()
         self.patch_data_dir_path()
 
@@ -26,12 +60,22 @@ class Patches:
         Gradio 에서 `/file={path} 경로가 앱 경로와 다른 장치에 위치할 때
         `Path.resolve().parents` 값 사용으로 인해 하위 디렉터리가 아닌 것으로 인식해
         접근할 수 없는 이슈를 해결하고자 기존 엔드포인트 함수를 재정의합니다. 
+
+        재정의한 경로는 ETag, Last-Modified 와 Range 요청을 지원하고
+        `?thumbnail=<크기>` 를 붙이면 크기를 줄인 WebP 썸네일을 반환합니다.
         """
         original_endpoint: Optional[Callable] = None
+        request_param_name = '__easy_sd_request'
+        pass_request = False
 
         async def endpoint(path: str, *args, **kwargs):
             original_error: ValueError
 
+            # 기존 엔드포인트가 요청 객체를 받지 않는다면 넘기지 않기
+            request: Request = kwargs[request_param_name]
+            if not pass_request:
+                del kwargs[request_param_name]
+
             try:
                 assert original_endpoint
                 return await original_endpoint(path, *args, **kwargs)
@@ -42,12 +86,16 @@ class Patches:
 
             # `Path.resolve()` 사용으로 인해 `app.cwd` 내에 있는 심볼릭 링크의 경우 ValueError 를 반환할 수 있음
             # https://github.com/gradio-app/gradio/blob/58b1a074ba342fe01445290d680a70c9304a9de1/gradio/routes.py#L263-L270
-            parents = Path(path).absolute().parents
-
-            if Path(shared.data_path).absolute() not in parents:
+            if self.allowed_roots.isdisjoint(Path(path).absolute().parents):
                 raise original_error
 
-            return FileResponse(path, headers={'Accept-Ranges': 'bytes'})
+            file_path = Path(path)
+
+            thumbnail = request.query_params.get('thumbnail')
+            if thumbnail and thumbnail.isdigit() and file_path.suffix.lower() in THUMBNAIL_SUFFIXES:
+                file_path = await run_in_threadpool(self.get_thumbnail, file_path, int(thumbnail))
+
+            return self.file_response(request, file_path)
 
         for route in self.app.router.routes:
             if not isinstance(route, APIRoute):
@@ -62,8 +110,148 @@ class Patches:
                 original_endpoint = route.dependant.call  # type: ignore
                 route.dependant.call = endpoint
 
+                # 조건부 요청 헤더를 읽을 수 있도록 요청 객체 받아오기
+                if route.dependant.request_param_name:
+                    request_param_name = route.dependant.request_param_name
+                    pass_request = True
+                else:
+                    route.dependant.request_param_name = request_param_name
+
             break
 
+    def file_response(self, request: Request, path: Path) -> Response:
+        """
+        조건부 요청에는 304 를, Range 요청에는 206 으로 필요한 구간만 응답합니다
+        """
+        stat = path.stat()
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+        headers = {
+            'ETag': etag,
+            'Last-Modified': last_modified,
+            'Accept-Ranges': 'bytes',
+            # 파일이 바뀌었을 수도 있으므로 매번 확인하되 바뀌지 않았다면 304 로 응답하기
+            'Cache-Control': 'no-cache',
+        }
+
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            if '*' in tags or etag in tags or f'W/{etag}' in tags:
+                return Response(status_code=304, headers=headers)
+
+        elif 'if-modified-since' in request.headers:
+            try:
+                since = parsedate_to_datetime(request.headers['if-modified-since']).timestamp()
+            except (TypeError, ValueError):
+                since = None
+
+            if since is not None and int(stat.st_mtime) <= since:
+                return Response(status_code=304, headers=headers)
+
+        # 확장 기능의 style.css 등은 브라우저가 MIME 형식을 엄격하게 확인하므로 확장자로 추측하기
+        media_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+
+        start, end = 0, stat.st_size - 1
+        status_code = 200
+
+        # 파일이 바뀌지 않았을 때만 Range 요청 처리하기
+        range_header = request.headers.get('range')
+        if_range = request.headers.get('if-range')
+        if range_header and (if_range is None or if_range in (etag, last_modified)):
+            match = re.fullmatch(r'bytes=(\d*)-(\d*)', range_header.strip())
+
+            # `bytes=500-100` 처럼 잘못된 구간은 무시하기 (RFC 9110)
+            if match and match[1] and match[2] and int(match[1]) > int(match[2]):
+                match = None
+
+            # 여러 구간을 요청했다면 무시하고 파일 전체 보내기
+            if match and (match[1] or match[2]):
+                if match[1]:
+                    range_start = int(match[1])
+                    range_end = min(int(match[2]), end) if match[2] else end
+                else:
+                    # bytes=-500 은 마지막 500 바이트
+                    range_start = max(0, stat.st_size - int(match[2]))
+                    range_end = end
+
+                # 파일 크기를 넘어서는 구간
+                if range_start > range_end:
+                    return Response(
+                        status_code=416,
+                        headers={**headers, 'Content-Range': f'bytes */{stat.st_size}'})
+
+                start, end = range_start, range_end
+                status_code = 206
+                headers['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+
+        headers['Content-Length'] = str(end - start + 1)
+
+        def iterate():
+            with path.open('rb') as file:
+                file.seek(start)
+                remaining = end - start + 1
+
+                while remaining > 0:
+                    chunk = file.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+
+                    remaining -= len(chunk)
+                    yield chunk
+
+        return StreamingResponse(
+            iterate(),
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type)
+
+    def get_thumbnail(self, path: Path, size: int) -> Path:
+        """
+        긴 변이 `size` 인 WebP 썸네일을 만들어 디스크에 캐시하고 경로를 반환합니다
+
+        캐시 용량이 넘치면 가장 오래 사용하지 않은 썸네일부터 지웁니다
+        """
+        size = max(THUMBNAIL_MIN_SIZE, min(size, THUMBNAIL_MAX_SIZE))
+        stat = path.stat()
+
+        key = f'{path.absolute()}:{stat.st_mtime_ns}:{stat.st_size}:{size}'
+        thumbnail_path = self.thumbnail_dir.joinpath(hashlib.sha1(key.encode()).hexdigest() + '.webp')
+
+        with self.thumbnail_lock:
+            if thumbnail_path in self.thumbnails and thumbnail_path.exists():
+                # 최근에 사용한 썸네일로 표시하기, 다시 시작해도 순서를 유지하도록 접근 시간도 바꾸기
+                # 수정 시간을 바꾸면 ETag 가 달라지므로 그대로 두기
+                self.thumbnails.move_to_end(thumbnail_path)
+                os.utime(thumbnail_path, ns=(time.time_ns(), thumbnail_path.stat().st_mtime_ns))
+                return thumbnail_path
+
+        from PIL import Image
+
+        with Image.open(path) as image:
+            image.thumbnail((size, size))
+
+            temp_path = thumbnail_path.with_suffix(f'.{threading.get_ident()}.tmp')
+            image.save(temp_path, 'WEBP', quality=80)
+            os.replace(temp_path, thumbnail_path)
+
+        with self.thumbnail_lock:
+            self.thumbnails[thumbnail_path] = thumbnail_path.stat().st_size
+            self.thumbnails.move_to_end(thumbnail_path)
+
+            total = sum(self.thumbnails.values())
+            while total > THUMBNAIL_CACHE_SIZE and len(self.thumbnails) > 1:
+                old_path, old_size = self.thumbnails.popitem(last=False)
+                total -= old_size
+
+                try:
+                    old_path.unlink()
+                except FileNotFoundError:
+                    pass
+
+        return thumbnail_path
+
     def patch_data_dir_path(self):
         """
         `--data-dir` 인자를 사용하면 `extensions/` 등의 위치를 Import 하는 확장 기능들이 망가져버리므로
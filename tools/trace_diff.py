@@ -0,0 +1,117 @@
+"""
+런처가 `WORKSPACE/logs/*.trace.jsonl` 에 남긴 실행 기록을 요약하거나 두 실행을 비교합니다
+
+    python tools/trace_diff.py 이전.trace.jsonl [이후.trace.jsonl] [--top 20] [--chrome out.json]
+
+`--chrome` 을 지정하면 chrome://tracing 이나 Perfetto 에서 열 수 있는 파일로도 내보냄
+"""
+import argparse
+import gzip
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def load_spans(path: Path) -> List[dict]:
+    spans = []
+
+    # 이전 실행 기록은 gzip 으로 압축되어 있음
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+
+def span_key(span: dict) -> str:
+    if span['cat'] == 'process':
+        return f"process: {span.get('summary') or span.get('args')}"
+    if span['cat'] == 'download':
+        return f"download: {Path(span.get('target', '')).name}"
+    return f"{span['cat']}: {span['name']}"
+
+
+def summarize(spans: List[dict]) -> Dict[str, float]:
+    durations: Dict[str, float] = defaultdict(float)
+    for span in spans:
+        durations[span_key(span)] += span['duration']
+
+    if spans:
+        durations['total'] = max(s['end'] for s in spans) - \
+            min(s['start'] for s in spans)
+
+    return durations
+
+
+def export_chrome(spans: List[dict], path: Path) -> None:
+    threads: Dict[str, int] = {}
+    events = []
+
+    for span in spans:
+        tid = threads.setdefault(span.get('thread', ''), len(threads) + 1)
+        args = {k: v for k, v in span.items()
+                if k not in ('name', 'cat', 'start', 'end', 'duration', 'thread')}
+        events.append({
+            'name': span_key(span),
+            'cat': span['cat'],
+            'ph': 'X',
+            'ts': int(span['start'] * 1e6),
+            'dur': int(span['duration'] * 1e6),
+            'pid': 1,
+            'tid': tid,
+            'args': args
+        })
+
+    with path.open('w') as file:
+        json.dump({'traceEvents': events}, file)
+
+
+def print_table(before: Dict[str, float], after: Optional[Dict[str, float]], top: int) -> None:
+    if after is None:
+        rows = sorted(before.items(), key=lambda kv: -kv[1])[:top]
+        for key, duration in rows:
+            print(f'{duration:>9.2f}s  {key}')
+        return
+
+    keys = set(before) | set(after)
+    rows = sorted(
+        keys,
+        key=lambda k: -abs(after.get(k, 0) - before.get(k, 0))
+    )[:top]
+
+    print(f'{"before":>10} {"after":>10} {"delta":>10}  name')
+    for key in rows:
+        a = before.get(key)
+        b = after.get(key)
+        delta = (b or 0) - (a or 0)
+        print(
+            f'{"-" if a is None else f"{a:.2f}s":>10} '
+            f'{"-" if b is None else f"{b:.2f}s":>10} '
+            f'{delta:>+9.2f}s  {key}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('before', type=Path)
+    parser.add_argument('after', type=Path, nargs='?')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--chrome', type=Path)
+    args = parser.parse_args()
+
+    before = load_spans(args.before)
+    after = load_spans(args.after) if args.after else None
+
+    if args.chrome:
+        export_chrome(after if after is not None else before, args.chrome)
+
+    print_table(
+        summarize(before),
+        summarize(after) if after is not None else None,
+        args.top)
+
+
+if __name__ == '__main__':
+    main()